@@ -1,14 +1,39 @@
+import asyncio
+import collections
+import contextlib
+import functools
+import hashlib
 import json
 import httpx
-from .errors import TelegraphException, RetryAfterError, NotAllowedTag, InvalidHTML
+from .errors import (
+    TelegraphException, RetryAfterError, NotAllowedTag, InvalidHTML,
+    ContentTooLarge, LongPageError
+)
+from .analytics import ViewsTable, normalize_bucket
+from .metrics import CallMetrics, timed
+from .routing import DomainRouter
+from .serializers import get_serializer
+from .utils import SingleFlight, aiter_items, imap_unordered
 import mimetypes
 import re
+import time
 from html.parser import HTMLParser
 from html.entities import name2codepoint
-from html import escape
+from html import escape, unescape
 
 RE_WHITESPACE = re.compile(r'(\s+)', re.UNICODE)
 
+CONTENT_SIZE_LIMIT = 64 * 1024  # bytes of JSON encoded content
+
+CHUNK_SIZE = 64 * 1024
+
+PART_URL_RESERVE = 512  # characters kept for each link between split pages
+
+JSON_HEADERS = {'Content-Type': 'application/json'}
+
+# read-only API methods, identical concurrent calls share one request
+COALESCED_METHODS = {'getPage', 'getViews', 'getAccountInfo', 'getPageList'}
+
 ALLOWED_TAGS = {
     'a', 'aside', 'b', 'blockquote', 'br', 'code', 'em', 'figcaption', 'figure',
     'h3', 'h4', 'hr', 'i', 'iframe', 'img', 'li', 'ol', 'p', 'pre', 's',
@@ -29,9 +54,102 @@ BLOCK_ELEMENTS = {
 }
 
 
-class HtmlToNodesParser(HTMLParser):
-    def __init__(self):
-        HTMLParser.__init__(self)
+class Node(object):
+    """ Compact element node, an alternative to {'tag', 'attrs', 'children'}
+        dicts. Supports the dict operations used on nodes (node['tag'],
+        node.get('attrs'), 'children' in node, ...) and is converted to a
+        dict only when encoded by json_dumps
+    """
+
+    __slots__ = ('tag', 'attrs', 'children')
+
+    def __init__(self, tag, attrs=None, children=None):
+        self.tag = tag
+        self.attrs = attrs
+        self.children = children
+
+    def __getitem__(self, key):
+        value = getattr(self, key, None) if key in self.__slots__ else None
+
+        if value is None:
+            raise KeyError(key)
+
+        return value
+
+    def __setitem__(self, key, value):
+        if key not in self.__slots__:
+            raise KeyError(key)
+
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self.__slots__ and getattr(self, key) is not None
+
+    def get(self, key, default=None):
+        value = getattr(self, key, None) if key in self.__slots__ else None
+        return default if value is None else value
+
+    def pop(self, key, *default):
+        try:
+            value = self[key]
+        except KeyError:
+            if default:
+                return default[0]
+            raise
+
+        setattr(self, key, None)
+        return value
+
+    def to_dict(self):
+        """Shallow dict form, children are left as they are"""
+        node = {'tag': self.tag}
+
+        if self.attrs is not None:
+            node['attrs'] = self.attrs
+
+        if self.children is not None:
+            node['children'] = self.children
+
+        return node
+
+    def __eq__(self, other):
+        if isinstance(other, (Node, dict)):
+            return nodes_to_dicts([self]) == nodes_to_dicts([other])
+
+        return NotImplemented
+
+    def __repr__(self):
+        return 'Node({!r}, {!r}, {!r})'.format(self.tag, self.attrs, self.children)
+
+
+def nodes_to_dicts(nodes):
+    """Deep copy of a nodes list with every Node converted to a dict"""
+    result = []
+
+    for node in nodes:
+        if isinstance(node, str):
+            result.append(node)
+            continue
+
+        node = node.to_dict() if isinstance(node, Node) else dict(node)
+
+        if node.get('children'):
+            node['children'] = nodes_to_dicts(node['children'])
+
+        result.append(node)
+
+    return result
+
+
+class NodesBuilder(object):
+    """ Builds Telegraph nodes from start tag, end tag and text events,
+        shared by the HTML parser engines
+
+    :param compact: Emit Node objects instead of dicts
+    """
+
+    def __init__(self, compact=False):
+        self.compact = compact
 
         self.nodes = []
 
@@ -40,13 +158,13 @@ class HtmlToNodesParser(HTMLParser):
 
         self.last_text_node = None
 
-        self.tags_path = []
+        self.pre_depth = 0
 
     def add_str_node(self, s):
         if not s:
             return
 
-        if 'pre' not in self.tags_path:  # keep whitespace in <pre>
+        if not self.pre_depth:  # keep whitespace in <pre>
             s = RE_WHITESPACE.sub(' ', s)
 
             if self.last_text_node is None or self.last_text_node.endswith(' '):
@@ -70,8 +188,7 @@ class HtmlToNodesParser(HTMLParser):
         if tag in BLOCK_ELEMENTS:
             self.last_text_node = None
 
-        node = {'tag': tag}
-        self.tags_path.append(tag)
+        node = Node(tag) if self.compact else {'tag': tag}
         self.current_nodes.append(node)
 
         if attrs_list:
@@ -82,6 +199,9 @@ class HtmlToNodesParser(HTMLParser):
                 attrs[attr] = value
 
         if tag not in VOID_ELEMENTS:
+            if tag == 'pre':
+                self.pre_depth += 1
+
             self.parent_nodes.append(self.current_nodes)
             self.current_nodes = node['children'] = []
 
@@ -99,11 +219,25 @@ class HtmlToNodesParser(HTMLParser):
         if last_node['tag'] != tag:
             raise InvalidHTML(f'{tag!r} tag closed instead of {last_node["tag"]!r}')
 
-        self.tags_path.pop()
+        if tag == 'pre':
+            self.pre_depth -= 1
 
         if not last_node['children']:
             last_node.pop('children')
 
+    def get_nodes(self):
+        if self.parent_nodes:
+            not_closed_tag = self.parent_nodes[-1][-1]['tag']
+            raise InvalidHTML(f'{not_closed_tag!r} tag is not closed')
+
+        return self.nodes
+
+
+class HtmlToNodesParser(NodesBuilder, HTMLParser):
+    def __init__(self, compact=False):
+        HTMLParser.__init__(self)
+        NodesBuilder.__init__(self, compact)
+
     def handle_data(self, data):
         self.add_str_node(data)
 
@@ -118,24 +252,517 @@ class HtmlToNodesParser(HTMLParser):
 
         self.add_str_node(c)
 
-    def get_nodes(self):
-        if self.parent_nodes:
-            not_closed_tag = self.parent_nodes[-1][-1]['tag']
-            raise InvalidHTML(f'{not_closed_tag!r} tag is not closed')
 
-        return self.nodes
+class _Unsupported(Exception):
+    pass
+
 
+_WS = r'[ \t\n\r\f]'
+# unquoted values keep a trailing '/' like in HTMLParser, <a href=x/> is
+# an a tag with href 'x/' and not a self-closing one
+_ATTR = (
+    r'([a-zA-Z_:][-a-zA-Z0-9_:.]*)'
+    r'(?:' + _WS + r'*=' + _WS + r'*(?:"([^"]*)"|\'([^\']*)\'|([^\s"\'=<>`]+)))?'
+)
 
-def html_to_nodes(html_content):
-    parser = HtmlToNodesParser()
+RE_FAST_TOKEN = re.compile(
+    r'<(?:'
+    r'([a-zA-Z][a-zA-Z0-9]*)((?:' + _WS + r'+' + _ATTR + r')*)' + _WS + r'*(/?)>'
+    r'|/([a-zA-Z][a-zA-Z0-9]*)' + _WS + r'*>'
+    r'|!--(?![->])(?:[^-]|-(?!-))*-->'
+    r')'
+)
+
+RE_FAST_ATTR = re.compile(_ATTR)
+
+_SIMPLE_REFS = (('&lt;', '<'), ('&gt;', '>'), ('&quot;', '"'), ('&#39;', "'"),
+                ('&amp;', '&'))  # &amp; goes last
+
+
+def _fast_unescape(s):
+    """html.unescape with a str.replace path for the common references"""
+    if '&' not in s:
+        return s
+
+    if s.count('&') == sum(s.count(ref) for ref, _ in _SIMPLE_REFS):
+        for ref, char in _SIMPLE_REFS:
+            s = s.replace(ref, char)
+        return s
+
+    return unescape(s)
+
+
+class FastHtmlToNodesParser(NodesBuilder):
+    """ Regex based HTML tokenizer producing the same nodes as
+        HtmlToNodesParser. Only plain start/end tags, quoted or simple
+        unquoted attributes and comments are tokenized here, anything
+        else raises _Unsupported and is left to HtmlToNodesParser
+    """
+
+    def feed(self, html_content):
+        if not isinstance(html_content, str):
+            raise _Unsupported
+
+        find = html_content.find
+        match = RE_FAST_TOKEN.match
+        add_str_node = self.add_str_node
+        handle_starttag = self.handle_starttag
+        handle_endtag = self.handle_endtag
+
+        i = 0
+
+        while True:
+            j = find('<', i)
+
+            if j < 0:
+                if '&' in html_content[i:]:
+                    raise _Unsupported  # HTMLParser holds back trailing refs
+
+                add_str_node(html_content[i:])
+                return
+
+            if i < j:
+                add_str_node(_fast_unescape(html_content[i:j]))
+
+            m = match(html_content, j)
+
+            if m is None:
+                raise _Unsupported
+
+            tag, attrs, self_closing, end_tag = m.group(1, 2, 7, 8)
+
+            if tag is not None:
+                tag = tag.lower()
+                handle_starttag(tag, self._parse_attrs(attrs) if attrs else [])
+
+                if self_closing:
+                    handle_endtag(tag)
+            elif end_tag is not None:
+                handle_endtag(end_tag.lower())
+
+            i = m.end()
+
+    @staticmethod
+    def _parse_attrs(attrs):
+        attrs_list = []
+
+        for m in RE_FAST_ATTR.finditer(attrs):
+            name, double, single, bare = m.groups()
+
+            if double is not None:
+                value = double
+            elif single is not None:
+                value = single
+            else:
+                value = bare
+
+            if value:
+                value = _fast_unescape(value)
+
+            attrs_list.append((name.lower(), value))
+
+        return attrs_list
+
+
+def _html_to_nodes_stdlib(html_content, compact=False):
+    parser = HtmlToNodesParser(compact)
     parser.feed(html_content)
     return parser.get_nodes()
 
 
-def nodes_to_html(nodes):
-    out = []
-    append = out.append
+def _html_to_nodes_fast(html_content, compact=False):
+    parser = FastHtmlToNodesParser(compact)
+
+    try:
+        parser.feed(html_content)
+    except _Unsupported:
+        return _html_to_nodes_stdlib(html_content, compact)
+
+    return parser.get_nodes()
+
+
+HTML_ENGINES = {
+    'stdlib': _html_to_nodes_stdlib,
+    'fast': _html_to_nodes_fast,
+}
+
+
+def html_to_nodes(html_content, engine=None, compact=False):
+    """ Convert HTML to Telegraph nodes
+
+    :param html_content: HTML string
+    :param engine: Parser engine name from HTML_ENGINES: 'stdlib'
+                   (html.parser, default) or 'fast' (regex tokenizer with
+                   identical output, falls back to html.parser on markup
+                   it doesn't handle)
+    :param compact: Return Node objects instead of dicts
+    """
+    return HTML_ENGINES[engine or 'stdlib'](html_content, compact)
+
+
+def json_size(value):
+    """Size in bytes of `value` encoded by json_dumps"""
+    return len(json_dumpb(value))
+
+
+class HtmlToNodesStreamParser(HtmlToNodesParser):
+    """ HtmlToNodesParser fed incrementally, keeps `size` equal to the
+        size in bytes of json_dumps(nodes) built so far
+
+    :param max_size: Raise ContentTooLarge once `size` goes above it
+    :param compact: Emit Node objects instead of dicts
+    """
+
+    def __init__(self, max_size=None, compact=False):
+        HtmlToNodesParser.__init__(self, compact)
+
+        self.max_size = max_size
+        self.size = 2  # []
+
+    def _grow(self, delta):
+        self.size += delta
+
+        if self.max_size is not None and self.size > self.max_size:
+            raise ContentTooLarge(self.size, self.max_size)
+
+    def add_str_node(self, s):
+        nodes = self.current_nodes
+        count = len(nodes)
+        last = nodes[-1] if count and isinstance(nodes[-1], str) else None
 
+        HtmlToNodesParser.add_str_node(self, s)
+
+        if len(nodes) > count:
+            self._grow(json_size(nodes[-1]) + (1 if count else 0))
+        elif last is not None and len(nodes[-1]) > len(last):
+            self._grow(json_size(nodes[-1][len(last):]) - 2)  # without quotes
+
+    def handle_starttag(self, tag, attrs_list):
+        nodes = self.current_nodes
+        count = len(nodes)
+
+        HtmlToNodesParser.handle_starttag(self, tag, attrs_list)
+
+        node = nodes[-1]
+        size = len('{"tag":}') + json_size(tag) + (1 if count else 0)
+
+        if 'attrs' in node:
+            size += len(',"attrs":{}') + len(node['attrs']) - 1
+            for attr, value in node['attrs'].items():
+                size += json_size(attr) + 1 + json_size(value)
+
+        if 'children' in node:
+            size += len(',"children":[]')
+
+        self._grow(size)
+
+    def handle_endtag(self, tag):
+        HtmlToNodesParser.handle_endtag(self, tag)
+
+        if tag not in VOID_ELEMENTS and 'children' not in self.current_nodes[-1]:
+            self.size -= len(',"children":[]')
+
+    def get_nodes(self):
+        self.close()
+        return HtmlToNodesParser.get_nodes(self)
+
+
+def _read_text(f):
+    while True:
+        chunk = f.read(CHUNK_SIZE)
+
+        if not chunk:  # '' or b'' at the end
+            return
+
+        if not isinstance(chunk, str):
+            raise TypeError('HTML file objects must be opened in text mode')
+
+        yield chunk
+
+
+def _read_chunks(chunks):
+    if hasattr(chunks, 'read'):
+        return _read_text(chunks)
+
+    if isinstance(chunks, str):
+        return iter((chunks,))
+
+    return chunks
+
+
+def html_to_nodes_stream(chunks, max_size=None, compact=False):
+    """ Convert HTML to nodes feeding it chunk by chunk
+
+    :param chunks: Iterable of HTML strings or a text file object
+    :param max_size: Raise ContentTooLarge as soon as the JSON encoded
+                     content gets bigger (e.g. CONTENT_SIZE_LIMIT)
+    :param compact: Return Node objects instead of dicts
+    """
+    parser = HtmlToNodesStreamParser(max_size, compact)
+
+    for chunk in _read_chunks(chunks):
+        parser.feed(chunk)
+
+    return parser.get_nodes()
+
+
+async def ahtml_to_nodes_stream(chunks, max_size=None, compact=False):
+    """ Same as html_to_nodes_stream, but also accepts async iterables
+        (e.g. rendered template streams or aiofiles file objects)
+    """
+    parser = HtmlToNodesStreamParser(max_size, compact)
+
+    if hasattr(chunks, 'read') and asyncio.iscoroutinefunction(chunks.read):
+        while True:
+            chunk = await chunks.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            parser.feed(chunk)
+    else:
+        async for chunk in aiter_items(_read_chunks(chunks)):
+            parser.feed(chunk)
+
+    return parser.get_nodes()
+
+
+def _with_children(node, children):
+    """Shallow copy of element `node` (dict or Node) with other children"""
+    if isinstance(node, Node):
+        return Node(node.tag, node.attrs, children)
+
+    node = dict(node)
+    node['children'] = children
+    return node
+
+
+RE_WORDS = re.compile(r'\S+\s*|\s+')
+
+
+class NodesSplitter(object):
+    """ Splits a nodes list into consecutive parts of at most `max_size`
+        bytes of JSON each, filling every part before starting the next
+
+        Parts are cut between block elements, and between runs of inline
+        nodes (text, <b>, <a> ...), so a block is only split when it
+        doesn't fit in a part on its own. Such a block is continued in
+        the next part inside a copy of its element (a long <pre> becomes
+        several <pre>), text is cut at line ends, then between words.
+        Every node is encoded once, only nodes that are split are
+        encoded again piece by piece.
+
+    :param max_size: Maximum size in bytes of json_dumps(part)
+    """
+
+    __slots__ = ('max_size', 'parts', 'size', '_path', '_shell_sizes',
+                 '_lists')
+
+    def __init__(self, max_size=CONTENT_SIZE_LIMIT):
+        self.max_size = max_size
+        self.parts = []
+        self.size = 0
+
+        self._path = []  # elements being split, outermost first
+        self._shell_sizes = []  # their size without children
+        self._lists = []  # children lists the next node goes to, part first
+
+        self._new_part()
+
+    def split(self, nodes):
+        self.add(nodes)
+        self._prune()
+        return self.parts
+
+    @property
+    def _base_size(self):
+        return 2 + sum(self._shell_sizes)
+
+    def _fits(self, size):
+        return self.size + size + (1 if self._lists[-1] else 0) <= self.max_size
+
+    def _fits_alone(self, size):
+        return self._base_size + size <= self.max_size
+
+    def _make_room(self, size):
+        """ Start a new part if `size` bytes don't fit in the current one
+            but would fit in a new one
+        """
+        if (not self._fits(size) and self._fits_alone(size)
+                and self.size > self._base_size):
+            self._new_part()
+
+    def _prune(self):
+        """Drop elements opened at the end of the part that got no children"""
+        for items, parent in zip(reversed(self._lists[1:]),
+                                 reversed(self._lists[:-1])):
+            if items:
+                break
+
+            parent.pop()
+
+    def _new_part(self):
+        if self.parts:
+            self._prune()
+
+        part = []
+        self.parts.append(part)
+        self._lists = [part]
+        self.size = 2
+
+        for node, shell_size in zip(self._path, self._shell_sizes):
+            self._open(node, shell_size)
+
+        if self.size > self.max_size:
+            raise ContentTooLarge(self.size, self.max_size)
+
+    def _append(self, node, size):
+        items = self._lists[-1]
+        self.size += size + (1 if items else 0)
+        items.append(node)
+
+    def _open(self, node, shell_size):
+        children = []
+        self._append(_with_children(node, children), shell_size)
+        self._lists.append(children)
+
+    def _units(self, nodes):
+        """ Block elements one by one, consecutive inline nodes together,
+            as lists of (node, size)
+        """
+        unit = []
+
+        for node in nodes:
+            if isinstance(node, str) or node['tag'] not in BLOCK_ELEMENTS:
+                unit.append((node, json_size(node)))
+                continue
+
+            if unit:
+                yield unit
+                unit = []
+
+            yield [(node, json_size(node))]
+
+        if unit:
+            yield unit
+
+    def add(self, nodes):
+        for unit in self._units(nodes):
+            size = sum(node_size for _, node_size in unit) + len(unit) - 1
+            self._make_room(size)
+
+            if self._fits(size):
+                for node, node_size in unit:
+                    self._append(node, node_size)
+                continue
+
+            for node, node_size in unit:
+                self._make_room(node_size)
+
+                if self._fits(node_size):
+                    self._append(node, node_size)
+                elif isinstance(node, str):
+                    self._add_text(node)
+                elif node.get('children'):
+                    self._add_element(node)
+                else:
+                    raise ContentTooLarge(self._base_size + node_size,
+                                          self.max_size)
+
+    def _add_element(self, node):
+        shell_size = json_size(_with_children(node, []))
+        self._make_room(shell_size)
+
+        if not self._fits(shell_size):
+            raise ContentTooLarge(self._base_size + shell_size, self.max_size)
+
+        self._path.append(node)
+        self._shell_sizes.append(shell_size)
+        self._open(node, shell_size)
+
+        self.add(node['children'])
+
+        self._path.pop()
+        self._shell_sizes.pop()
+        self._lists.pop()
+
+    def _text_pieces(self, text, limit):
+        """ Pieces of `text` and their JSON size without quotes, each
+            at most `limit`: lines, words of long lines, cuts of long words
+        """
+        for line in text.splitlines(True):
+            size = json_size(line) - 2
+
+            if size <= limit:
+                yield line, size
+                continue
+
+            for word in RE_WORDS.findall(line):
+                size = json_size(word) - 2
+
+                while size > limit:
+                    cut = min(len(word), limit)
+                    cut_size = json_size(word[:cut]) - 2
+
+                    while cut_size > limit:  # shrinks, one char always fits
+                        cut = max(cut * limit // cut_size, 1)
+                        cut_size = json_size(word[:cut]) - 2
+
+                    yield word[:cut], cut_size
+                    word = word[cut:]
+                    size -= cut_size
+
+                if word:
+                    yield word, size
+
+    def _add_text(self, text):
+        limit = self.max_size - self._base_size - 2
+
+        if limit < 6:  # a single escaped character
+            raise ContentTooLarge(self._base_size + json_size(text), self.max_size)
+
+        buffer = []
+        buffer_size = 0
+
+        for piece, size in self._text_pieces(text, limit):
+            if not self._fits(buffer_size + size + 2):
+                if buffer:
+                    self._append(''.join(buffer), buffer_size + 2)
+                    buffer = []
+                    buffer_size = 0
+
+                self._make_room(size + 2)
+
+            buffer.append(piece)
+            buffer_size += size
+
+        if buffer:
+            self._append(''.join(buffer), buffer_size + 2)
+
+
+def part_links(prev_url=None, next_url=None, labels=('« Previous', 'Next »')):
+    """<p> linking a part of a split page to its neighbours"""
+    children = []
+
+    for url, label in zip((prev_url, next_url), labels):
+        if url:
+            if children:
+                children.append(' | ')
+
+            children.append({'tag': 'a', 'attrs': {'href': url}, 'children': [label]})
+
+    return {'tag': 'p', 'children': children}
+
+
+def split_nodes(nodes, max_size=CONTENT_SIZE_LIMIT):
+    """ Split a nodes list into the fewest consecutive parts that encode
+        to at most `max_size` bytes each, see NodesSplitter
+    """
+    return NodesSplitter(max_size).split(nodes)
+
+
+def render_nodes_html(nodes, write):
+    """ Render nodes (dicts or Node objects) to HTML, passing every
+        fragment to `write` as soon as it's produced
+    """
     stack = []
     curr = nodes
     i = -1
@@ -147,35 +774,77 @@ def nodes_to_html(nodes):
             if not stack:
                 break
             curr, i = stack.pop()
-            append(f'</{curr[i]["tag"]}>')
+            write(f'</{curr[i]["tag"]}>')
             continue
 
         node = curr[i]
 
         if isinstance(node, str):
-            append(escape(node))
+            write(escape(node))
             continue
 
-        append(f'<{node["tag"]}')
+        write(f'<{node["tag"]}')
 
         if node.get('attrs'):
             for attr, value in node['attrs'].items():
-                append(f' {attr}="{escape(value)}"')
+                write(f' {attr}="{escape(value)}"')
 
         if node.get('children'):
-            append('>')
+            write('>')
             stack.append((curr, i))
             curr, i = node['children'], -1
             continue
 
         if node["tag"] in VOID_ELEMENTS:
-            append('/>')
+            write('/>')
         else:
-            append(f'></{node["tag"]}>')
+            write(f'></{node["tag"]}>')
+
 
+def nodes_to_html(nodes):
+    out = []
+    render_nodes_html(nodes, out.append)
     return ''.join(out)
 
 
+def write_nodes_html(nodes, fp, buffer_size=CHUNK_SIZE):
+    """ Stream HTML of `nodes` into a text file-like object without
+        building the whole document in memory
+
+    :param nodes: Nodes list (dicts or Node objects)
+    :param fp: Object with a write(str) method
+    :param buffer_size: Fragments are joined into writes of about this size
+    """
+    buffer = []
+    size = 0
+
+    def write(fragment):
+        nonlocal size
+
+        buffer.append(fragment)
+        size += len(fragment)
+
+        if size >= buffer_size:
+            fp.write(''.join(buffer))
+            buffer.clear()
+            size = 0
+
+    render_nodes_html(nodes, write)
+
+    if buffer:
+        fp.write(''.join(buffer))
+
+
+@functools.lru_cache(maxsize=None)
+def _mime_types():
+    return mimetypes.MimeTypes()  # reads the system mime.types files
+
+
+def guess_mimetype(filename):
+    """Guess a MIME type by file name, the types database is loaded once"""
+    return _mime_types().guess_type(filename)[0]
+
+
 class FilesOpener(object):
     def __init__(self, paths, key_format='file{}'):
         if not isinstance(paths, list):
@@ -214,7 +883,7 @@ class FilesOpener(object):
                 f = open(filename, 'rb')
                 self.opened_files.append(f)
 
-            mimetype = mimetypes.MimeTypes().guess_type(filename)[0]
+            mimetype = guess_mimetype(filename)
 
             files.append(
                 (self.key_format.format(x), ('file{}'.format(x), f, mimetype))
@@ -229,60 +898,421 @@ class FilesOpener(object):
         self.opened_files = []
 
 
+def _json_default(obj):
+    if isinstance(obj, Node):
+        return obj.to_dict()
+
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
 def json_dumps(*args, **kwargs):
+    """ Compact JSON of Nodes, dicts and lists with the configured
+        serializer (see bcnadds.serializers), other json.dumps
+        arguments go to the stdlib encoder
+    """
+    kwargs.setdefault('default', _json_default)
+
+    if len(args) == 1 and len(kwargs) == 1:
+        return get_serializer().dumps(args[0], kwargs['default'])
+
     return json.dumps(*args, **kwargs, separators=(',', ':'), ensure_ascii=False)
 
 
+def json_dumpb(obj):
+    """json_dumps encoded to UTF-8, without an intermediate str if possible"""
+    return get_serializer().dumpb(obj, _json_default)
+
+
+def json_body(values):
+    """ JSON request body of API call `values`. bytes values are JSON
+        encoded already (e.g. page content) and are embedded as they are,
+        None values are left out. The pieces are joined once, large
+        content is copied a single time
+    """
+    serializer = get_serializer()
+    pieces = []
+
+    for key, value in values.items():
+        if value is None:
+            continue
+
+        if not isinstance(value, bytes):
+            value = serializer.dumpb(value, _json_default)
+
+        pieces += (b',', serializer.dumpb(key), b':', value)
+
+    pieces[:1] = [b'{']  # replaces the leading comma
+    pieces.append(b'}')
+    return b''.join(pieces)
+
+
+# page_values arguments set by the bulk calls themselves, not by page specs
+_BULK_RESERVED = ('return_content', 'return_html', 'html_engine', 'metrics')
+
+
+def page_values(title, content=None, html_content=None, author_name=None,
+                author_url=None, return_content=False, html_engine=None,
+                metrics=None):
+    """ Build createPage/editPage request values, parsing `html_content`
+        when `content` is not given. The content is encoded to JSON bytes
+        once and embedded in the request body as is
+    """
+    if content is None:
+        with timed(metrics, 'parse'):
+            content = html_to_nodes(html_content, html_engine)
+
+    with timed(metrics, 'serialize'):
+        content = json_dumpb(content)
+
+    return {
+        'title': title,
+        'author_name': author_name,
+        'author_url': author_url,
+        'content': content,
+        'return_content': return_content
+    }
+
+
+def page_hash(values):
+    """Hash of the title, author and content of page request values"""
+    digest = hashlib.sha256(json_dumpb([
+        values['title'], values['author_name'], values['author_url']
+    ]))
+    digest.update(values['content'])
+    return digest.hexdigest()
+
+
+class BulkResult(object):
+    """ Result of one page in a bulk operation
+
+    :param index: Position of the page spec in the input
+    :param spec: Page spec as passed in
+    :param result: API response, None on error
+    :param error: Exception raised for this page, None on success
+    """
+
+    __slots__ = ('index', 'spec', 'result', 'error')
+
+    def __init__(self, index, spec, result=None, error=None):
+        self.index = index
+        self.spec = spec
+        self.result = result
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        return 'BulkResult(index={!r}, result={!r}, error={!r})'.format(
+            self.index, self.result, self.error
+        )
+
+
+def create_session(limits=None, timeout=None, http2=False, transport=None):
+    """ Create an httpx.AsyncClient suitable for sharing between
+        many TgGraph instances
+
+    :param limits: Connection pool limits (httpx.Limits)
+    :param timeout: Request timeout in seconds or httpx.Timeout
+    :param http2: Enable HTTP/2 (requires the `h2` package)
+    :param transport: Custom httpx transport (e.g. for a local test server)
+    """
+    kwargs = {'http2': http2}
+
+    if limits is not None:
+        kwargs['limits'] = limits
+
+    if timeout is not None:
+        kwargs['timeout'] = timeout
+
+    if transport is not None:
+        kwargs['transport'] = transport
+
+    return httpx.AsyncClient(**kwargs)
+
+
+_PLAIN_TYPES = (str, bytes, int, float, bool, type(None))
+
+
+def _coalesce_key(method, path, values):
+    """ Hashable key of a call, None if a value can't be made one """
+    items = []
+
+    try:
+        for name, value in sorted(values.items()):
+            # the type too, True and 1 or a list and its JSON differ
+            kind = type(value).__name__
+
+            if not isinstance(value, _PLAIN_TYPES):
+                value = json_dumps(value, sort_keys=True)
+
+            items.append((name, kind, value))
+    except (TypeError, ValueError):
+        return None
+
+    return method, path, tuple(items)
+
+
 class TgGraphApi:
     """ Telegraph API Client
 
     :param access_token: access_token
     :type access_token: str
 
-    :param domain: domain (e.g. alternative mirror graph.org)
+    :param domain: domain (e.g. alternative mirror graph.org), a list of
+                   domains or a DomainRouter to send every call to the
+                   healthiest domain and take failing ones out of rotation
+    :type domain: str, list or bcnadds.routing.DomainRouter
+
+    :param scheduler: optional RequestScheduler used to rate limit requests
+                      and retry them after flood waits
+    :type scheduler: bcnadds.scheduler.RequestScheduler
+
+    :param session: shared httpx.AsyncClient, it's not closed by aclose()
+    :type session: httpx.AsyncClient
+
+    :param limits: connection pool limits for the own session
+    :type limits: httpx.Limits
+
+    :param timeout: request timeout for the own session
+    :type timeout: float or httpx.Timeout
+
+    :param http2: enable HTTP/2 for the own session
+
+    :param coalesce: identical concurrent calls of COALESCED_METHODS share
+                     one in-flight request
+
+    :param observers: instrumentation hooks notified about every call
+    :type observers: list of bcnadds.metrics.Observer
     """
 
-    __slots__ = ('access_token', 'domain', 'session')
+    __slots__ = ('access_token', 'domain', 'router', 'session', 'scheduler',
+                 'coalesce', 'observers', '_own_session', '_in_flight')
 
-    def __init__(self, access_token=None, domain='telegra.ph'):
+    def __init__(self, access_token=None, domain='telegra.ph', scheduler=None,
+                 session=None, limits=None, timeout=None, http2=False,
+                 coalesce=True, observers=None):
         self.access_token = access_token
-        self.domain = domain
-        self.session = httpx.AsyncClient()
+        self.scheduler = scheduler
+        self.coalesce = coalesce
+        self.observers = list(observers) if observers else []
+        self._in_flight = SingleFlight()
+
+        if isinstance(domain, (list, tuple)):
+            domain = DomainRouter(domain)
+
+        if isinstance(domain, DomainRouter):
+            self.router = domain
+            self.domain = domain.domains[0]
+        else:
+            self.router = None
+            self.domain = domain
+
+        if session is None:
+            session = create_session(limits, timeout, http2)
+            self._own_session = True
+        else:
+            self._own_session = False
+
+        self.session = session
+
+    async def aclose(self):
+        """ Close the session if it was created by this client """
+        if self._own_session and not self.session.is_closed:
+            await self.session.aclose()
+
+    @contextlib.contextmanager
+    def track(self, method, metrics=None):
+        """ Measure a call and report it to the observers when done.
+            Yields CallMetrics, or None when there are no observers.
+            If `metrics` is passed the caller owns and reports it
+        """
+        if metrics is not None or not self.observers:
+            yield metrics
+            return
 
-    async def method(self, method, values=None, path=''):
+        metrics = CallMetrics(method)
+        start = time.perf_counter()
+
+        try:
+            yield metrics
+        except BaseException as e:
+            metrics.error = e
+            raise
+        else:
+            metrics.error = None  # errors of retried attempts
+        finally:
+            metrics.total = time.perf_counter() - start
+            self._notify('on_call', metrics)
+
+    def _notify(self, hook, *args):
+        for observer in self.observers:
+            getattr(observer, hook)(*args)
+
+    async def method(self, method, values=None, path='', priority=0,
+                     metrics=None):
         values = values.copy() if values is not None else {}
 
         if 'access_token' not in values and self.access_token:
             values['access_token'] = self.access_token
 
-        response = (await self.session.post(
-            'https://api.{}/{}/{}'.format(self.domain, method, path),
-            data=values
-        )).json()
+        with self.track(method, metrics) as metrics:
+            key = None
 
-        if response.get('ok'):
-            return response['result']
+            if self.coalesce and method in COALESCED_METHODS:
+                key = _coalesce_key(method, path, values)
+
+            if key is not None:
+                def start():
+                    if metrics is not None:
+                        metrics.coalesced = False
+                    return self._dispatch(method, values, path, priority, metrics)
 
-        error = response.get('error')
+                if metrics is not None:
+                    metrics.coalesced = True
+
+                result = await self._in_flight.do(key, start)
+                # every caller gets its own dict, callers may replace fields
+                return dict(result) if isinstance(result, dict) else result
+
+            return await self._dispatch(method, values, path, priority, metrics)
+
+    async def _dispatch(self, method, values, path, priority, metrics):
+        # encoded once, retries and failovers resend the same body
+        body = json_body(values)
+        call = functools.partial(self._method, method, body, path, metrics)
+        return await self._route(call, values.get('access_token'), priority)
+
+    async def _route(self, call, token=None, priority=0):
+        """ Run call(domain) on the configured domain or, with a router,
+            on the healthiest one. Calls that couldn't connect are retried
+            on the next domain, other failures are only recorded since
+            the request may have reached the server. With a scheduler
+            every domain tried is rate limited on its own
+        """
+        if self.router is None:
+            return await self._schedule(call, self.domain, token, priority)
+
+        tried = set()
+        started = [0.0]  # latency excludes the time queued in the scheduler
+
+        async def timed(domain):
+            started[0] = time.monotonic()
+            return await call(domain)
+
+        while True:
+            domain = self.router.choose(exclude=tried)
+            started[0] = time.monotonic()
+
+            try:
+                result = await self._schedule(timed, domain, token, priority)
+            except TelegraphException:
+                self.router.record(domain, time.monotonic() - started[0], True)
+                raise
+            except (httpx.TransportError, ValueError) as e:
+                self.router.record(domain, time.monotonic() - started[0], False)
+                tried.add(domain)
+
+                if (isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout))
+                        and len(tried) < len(self.router.stats)):
+                    continue
+
+                raise
+            finally:
+                # a cancelled probe mustn't keep the domain out of rotation
+                self.router.release(domain)
+
+            self.router.record(domain, time.monotonic() - started[0], True)
+            return result
+
+    async def _schedule(self, call, domain, token, priority):
+        if self.scheduler is None:
+            return await call(domain)
+
+        return await self.scheduler.submit(
+            lambda: call(domain),
+            token=token,
+            domain=domain,
+            priority=priority
+        )
+
+    async def _post(self, url, metrics, domain, **kwargs):
+        if metrics is None:
+            response = await self.session.post(url, **kwargs)
+            return get_serializer().loads(response.content)
+
+        if metrics.attempts:
+            self._notify('on_retry', metrics, metrics.error)
+
+        metrics.attempts += 1
+        metrics.domain = domain
+        start = time.perf_counter()
+
+        try:
+            response = await self.session.post(url, **kwargs)
+            result = get_serializer().loads(response.content)
+        except Exception as e:
+            metrics.error = e
+            raise
+        finally:
+            metrics.network += time.perf_counter() - start
+
+        metrics.request_bytes += int(response.request.headers.get('Content-Length', 0))
+        metrics.response_bytes += len(response.content)
+
+        return result
+
+    def _raise_error(self, error, metrics):
         if isinstance(error, str) and error.startswith('FLOOD_WAIT_'):
             retry_after = int(error.rsplit('_', 1)[-1])
-            raise RetryAfterError(retry_after)
+            e = RetryAfterError(retry_after)
+
+            if metrics is not None:
+                metrics.flood_waits += 1
+                self._notify('on_flood_wait', metrics, retry_after)
         else:
-            raise TelegraphException(error)
+            e = TelegraphException(error)
 
-    async def file_upload(self, f):
+        if metrics is not None:
+            metrics.error = e
+
+        raise e
+
+    async def _method(self, method, body, path, metrics, domain):
+        response = (await self._post(
+            'https://api.{}/{}/{}'.format(domain, method, path),
+            metrics, domain,
+            content=body,
+            headers=JSON_HEADERS
+        ))
+
+        if response.get('ok'):
+            return response['result']
+
+        self._raise_error(response.get('error'), metrics)
+
+    async def file_upload(self, f, priority=0, metrics=None):
         """ Upload file. NOT PART OF OFFICIAL API, USE AT YOUR OWN RISK
             Returns a list of dicts with `src` key.
             Allowed only .jpg, .jpeg, .png, .gif and .mp4 files.
 
         :param f: filename or file-like object.
         :type f: file, str or list
+
+        :param priority: scheduler priority, lower values go first
         """
+        with self.track('upload', metrics) as metrics:
+            call = functools.partial(self._file_upload, f, metrics)
+            return await self._route(call, self.access_token, priority)
+
+    async def _file_upload(self, f, metrics, domain):
         with FilesOpener(f) as files:
-            response = (await self.session.post(
-                'https://{}/upload'.format(self.domain),
+            response = (await self._post(
+                'https://{}/upload'.format(domain),
+                metrics, domain,
                 files=files
-            )).json()
+            ))
 
         if isinstance(response, list):
             error = response[0].get('error')
@@ -290,11 +1320,7 @@ class TgGraphApi:
             error = response.get('error')
 
         if error:
-            if isinstance(error, str) and error.startswith('FLOOD_WAIT_'):
-                retry_after = int(error.rsplit('_', 1)[-1])
-                raise RetryAfterError(retry_after)
-            else:
-                raise TelegraphException(error)
+            self._raise_error(error, metrics)
 
         return response
 
@@ -303,18 +1329,126 @@ class TgGraph:
     """ Telegraph API client helper
 
     :param access_token: access token
-    :param domain: domain (e.g. alternative mirror graph.org)
+    :param domain: domain (e.g. alternative mirror graph.org), or a list
+                   of domains / DomainRouter for latency based failover
+    :param scheduler: optional RequestScheduler shared by all requests
+                      (rate limits, priorities and flood-wait retries)
+    :param session: httpx.AsyncClient to share one connection pool between
+                    many accounts (see create_session), left open on aclose()
+    :param limits: httpx.Limits for the own connection pool
+    :param timeout: Request timeout for the own connection pool
+    :param http2: Enable HTTP/2 for the own connection pool
+    :param html_engine: html_to_nodes engine used for html_content
+                        ('stdlib' or 'fast', see HTML_ENGINES)
+    :param coalesce: Share one request between identical concurrent
+                     get_page, get_views, get_account_info and
+                     get_page_list calls
+    :param observers: Instrumentation hooks (bcnadds.metrics.Observer,
+                      e.g. MetricsCollector) reporting timings, sizes,
+                      flood waits and retries of every call
+    :param cache: optional cache backend (bcnadds.cache.MemoryCache or
+                  DiskCache) for get_page, get_account_info and
+                  get_page_list, invalidated by edit_page and create_page
+    :param page_hashes: optional cache backend remembering a hash of the
+                        last published title, author and content per path
+                        (e.g. DiskCache(directory, ttl=None)); edit_page
+                        then skips edits that change nothing
+    :param mirror: optional bcnadds.mirror.PageMirror kept up to date by
+                   sync_mirror; pages edited with edit_page are marked
+                   stale in it so their content is fetched again
+
+    Can be used as an async context manager to close the connection pool:
+
+        async with TgGraph(token) as graph:
+            await graph.get_page_list()
     """
 
-    __slots__ = ('_tgraph',)
+    __slots__ = ('_tgraph', 'html_engine', 'cache', 'page_hashes', 'mirror')
+
+    def __init__(self, access_token=None, domain='telegra.ph', scheduler=None,
+                 session=None, limits=None, timeout=None, http2=False,
+                 html_engine=None, cache=None, page_hashes=None,
+                 coalesce=True, observers=None, mirror=None):
+        self._tgraph = TgGraphApi(
+            access_token, domain, scheduler, session, limits, timeout, http2,
+            coalesce, observers
+        )
+        self.html_engine = html_engine
+        self.cache = cache
+        self.page_hashes = page_hashes
+        self.mirror = mirror
 
-    def __init__(self, access_token=None, domain='telegra.ph'):
-        self._tgraph = TgGraphApi(access_token, domain)
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aclose()
+
+    async def aclose(self):
+        """Close the connection pool unless it was passed in as `session`"""
+        await self._tgraph.aclose()
 
     def get_access_token(self):
         """Get current access_token"""
         return self._tgraph.access_token
 
+    async def _cached(self, namespace, name, method, values=None, path='',
+                      metrics=None):
+        if self.cache is None:
+            return await self._tgraph.method(method, values, path,
+                                             metrics=metrics)
+
+        response = self.cache.get(namespace, name)
+
+        if response is None:
+            response = await self._tgraph.method(method, values, path,
+                                                 metrics=metrics)
+            self.cache.set(namespace, name, response)
+
+        return dict(response)  # callers may replace fields (e.g. content)
+
+    def _invalidate(self, *namespaces):
+        if self.cache is not None:
+            for namespace in namespaces:
+                self.cache.delete(namespace)
+
+    def _page_list_namespace(self):
+        return 'pages:{}'.format(self._tgraph.access_token)
+
+    def _account_namespace(self):
+        return 'account:{}'.format(self._tgraph.access_token)
+
+    async def _publish(self, method, values, path='', force=False,
+                       metrics=None):
+        digest = None
+
+        if self.page_hashes is not None:
+            digest = page_hash(values)
+
+            if (method == 'editPage' and not force
+                    and self.page_hashes.get('hash:{}'.format(path), '') == digest):
+                return {'path': path, 'title': values['title'], 'skipped': True}
+
+        response = await self._tgraph.method(method, path=path, values=values,
+                                             metrics=metrics)
+
+        if method == 'editPage':
+            self._invalidate('page:{}'.format(path), self._page_list_namespace())
+
+            if self.mirror is not None:
+                self.mirror.mark_stale(path)
+        else:
+            self._invalidate(self._page_list_namespace(), self._account_namespace())
+            path = response.get('path')
+
+        if digest is not None:
+            if path:
+                self.page_hashes.set('hash:{}'.format(path), '', digest)
+
+            response['skipped'] = False
+
+        return response
+
     async def create_account(self, short_name, author_name=None, author_url=None,
                              replace_token=True):
         """ Create a new Telegraph account
@@ -354,12 +1488,16 @@ class TgGraph:
                            author's name below the title. Can be any link,
                            not necessarily to a Telegram profile or channels
         """
-        return (await self._tgraph.method('editAccountInfo', values={
+        response = (await self._tgraph.method('editAccountInfo', values={
             'short_name': short_name,
             'author_name': author_name,
             'author_url': author_url
         }))
 
+        self._invalidate(self._account_namespace())
+
+        return response
+
     async def revoke_access_token(self):
         """ Revoke access_token and generate a new one, for example,
             if the user would like to reset all connected sessions, or
@@ -380,12 +1518,16 @@ class TgGraph:
         :param return_content: If true, content field will be returned
         :param return_html: If true, returns HTML instead of Nodes list
         """
-        response = (await self._tgraph.method('getPage', path=path, values={
-            'return_content': return_content
-        }))
+        with self._tgraph.track('getPage') as metrics:
+            response = (await self._cached(
+                'page:{}'.format(path), 'content' if return_content else 'info',
+                'getPage', path=path, values={'return_content': return_content},
+                metrics=metrics
+            ))
 
-        if return_content and return_html:
-            response['content'] = nodes_to_html(response['content'])
+            if return_content and return_html:
+                with timed(metrics, 'render'):
+                    response['content'] = nodes_to_html(response['content'])
 
         return response
 
@@ -403,29 +1545,30 @@ class TgGraph:
         :param return_content: If true, a content field will be returned
         :param return_html: If true, returns HTML instead of Nodes list
         """
-        if content is None:
-            content = html_to_nodes(html_content)
-
-        content_json = json_dumps(content)
+        with self._tgraph.track('createPage') as metrics:
+            values = page_values(title, content, html_content, author_name,
+                                 author_url, return_content, self.html_engine,
+                                 metrics)
 
-        response = (await self._tgraph.method('createPage', values={
-            'title': title,
-            'author_name': author_name,
-            'author_url': author_url,
-            'content': content_json,
-            'return_content': return_content
-        }))
+            response = (await self._publish('createPage', values,
+                                             metrics=metrics))
 
-        if return_content and return_html:
-            response['content'] = nodes_to_html(response['content'])
+            if return_content and return_html:
+                with timed(metrics, 'render'):
+                    response['content'] = nodes_to_html(response['content'])
 
         return response
 
     async def edit_page(self, path, title, content=None, html_content=None,
                         author_name=None, author_url=None, return_content=False,
-                        return_html=False):
+                        return_html=False, force=False):
         """ Edit an existing Telegraph page
 
+            With `page_hashes` set, an edit that changes nothing since the
+            last publish is not sent and {'path', 'title', 'skipped': True}
+            is returned instead (without content), real edits get
+            'skipped': False
+
         :param path: Path to the page
         :param title: Page title
         :param content: Content in nodes list format (see doc)
@@ -435,24 +1578,184 @@ class TgGraph:
                            the author's name below the title
         :param return_content: If true, a content field will be returned
         :param return_html: If true, returns HTML instead of Nodes list
+        :param force: Send the edit even if nothing changed
+        """
+        with self._tgraph.track('editPage') as metrics:
+            values = page_values(title, content, html_content, author_name,
+                                 author_url, return_content, self.html_engine,
+                                 metrics)
+
+            response = (await self._publish('editPage', values, path, force,
+                                             metrics))
+
+            if return_content and return_html and 'content' in response:
+                with timed(metrics, 'render'):
+                    response['content'] = nodes_to_html(response['content'])
+
+        return response
+
+    async def create_long_page(self, title, content=None, html_content=None,
+                               author_name=None, author_url=None,
+                               max_size=CONTENT_SIZE_LIMIT,
+                               part_title='{title} ({part}/{parts})',
+                               labels=('« Previous', 'Next »'), concurrency=4):
+        """ Create a page, or several linked pages if the content is too big
+            for one. The content size is tracked while converting HTML, so
+            content that fits is published with a single create_page.
+            Otherwise it's split at block elements into the fewest parts
+            (see NodesSplitter), a page is created for every part and
+            then filled in with its part and links to the previous and
+            next parts, both steps with `concurrency` requests in flight.
+            Returns the createPage/editPage responses, in order
+
+        :param title: Page title
+        :param content: Content in nodes list format (see doc)
+        :param html_content: Content in HTML format
+        :param author_name: Author name, displayed below the article's title
+        :param author_url: Profile link, opened when users click on
+                           the author's name below the title
+        :param max_size: Maximum size in bytes of the content of a page
+        :param part_title: Title of the parts, a format string with
+                           {title}, {part} and {parts}
+        :param labels: Texts of the previous and next links
+        :param concurrency: Maximum number of requests in flight
         """
         if content is None:
-            content = html_to_nodes(html_content)
+            parser = HtmlToNodesStreamParser()
+            parser.feed(html_content)
+            content = parser.get_nodes()
+            size = parser.size
+        else:
+            size = json_size(content)
+
+        if size <= max_size:
+            return [await self.create_page(title, content, None, author_name,
+                                           author_url)]
+
+        # links are added once the page urls are known, keep room for them
+        reserve = json_size(part_links('x' * PART_URL_RESERVE,
+                                       'x' * PART_URL_RESERVE, labels)) + 1
+        parts = split_nodes(content, max_size - reserve)
+        titles = [
+            part_title.format(title=title, part=i + 1, parts=len(parts))
+            for i in range(len(parts))
+        ]
+
+        async def run(step, calls, pages=None):
+            results = [None] * len(calls)
+            errors = []
+
+            # let the other calls finish, so every created page is reported
+            async for i, _, result, error in imap_unordered(
+                    lambda i: calls[i](), range(len(calls)), concurrency):
+                if error is not None:
+                    errors.append(error)
+                else:
+                    results[i] = result
+
+            if errors:
+                if pages is None:
+                    pages, results = results, None
+
+                raise LongPageError(step, pages, results, errors) from errors[0]
+
+            return results
+
+        pages = await run('createPage', [
+            functools.partial(self.create_page, name, ['…'], None,
+                              author_name, author_url)
+            for name in titles
+        ])
+        urls = [page['url'] for page in pages]
+
+        return await run('editPage', [
+            functools.partial(
+                self.edit_page, pages[i]['path'], titles[i],
+                parts[i] + [part_links(urls[i - 1] if i else None,
+                                       urls[i + 1] if i + 1 < len(urls) else None,
+                                       labels)],
+                None, author_name, author_url, force=True
+            )
+            for i in range(len(parts))
+        ], pages)
+
+    def create_pages_bulk(self, pages, concurrency=8, return_content=False,
+                          return_html=False, executor=None):
+        """ Create many Telegraph pages with bounded concurrency.
+            Async generator yielding a BulkResult per page as they finish,
+            errors are reported per page instead of being raised
+
+        :param pages: Iterable or async iterable of page specs, dicts with
+                      create_page arguments (title, content or html_content,
+                      author_name, author_url)
+        :param concurrency: Maximum number of requests in flight
+        :param return_content: If true, a content field will be returned
+        :param return_html: If true, returns HTML instead of Nodes list
+        :param executor: concurrent.futures executor used to parse and
+                         serialize content (default loop executor)
+        """
+        return self._pages_bulk('createPage', pages, concurrency,
+                                return_content, return_html, executor)
 
-        content_json = json_dumps(content)
+    def edit_pages_bulk(self, pages, concurrency=8, return_content=False,
+                        return_html=False, executor=None):
+        """ Edit many Telegraph pages with bounded concurrency.
+            Same as create_pages_bulk, but every page spec needs a `path`
+        """
+        return self._pages_bulk('editPage', pages, concurrency,
+                                return_content, return_html, executor)
+
+    def sync_pages(self, pages, concurrency=8, executor=None):
+        """ Bring many pages up to date, sending only what changed.
+            Specs with a `path` are edited (skipped when unchanged, needs
+            `page_hashes`), specs without one are created. Async generator
+            yielding a BulkResult per page, result['skipped'] tells
+            whether the edit was sent
+
+        :param pages: Iterable or async iterable of page specs
+        :param concurrency: Maximum number of requests in flight
+        :param executor: concurrent.futures executor used to parse and
+                         serialize content (default loop executor)
+        """
+        if self.page_hashes is None:
+            raise ValueError('sync_pages needs TgGraph(page_hashes=...)')
 
-        response = (await self._tgraph.method('editPage', path=path, values={
-            'title': title,
-            'author_name': author_name,
-            'author_url': author_url,
-            'content': content_json,
-            'return_content': return_content
-        }))
+        return self._pages_bulk(None, pages, concurrency, False, False, executor)
 
-        if return_content and return_html:
-            response['content'] = nodes_to_html(response['content'])
+    async def _pages_bulk(self, method, pages, concurrency, return_content,
+                          return_html, executor):
+        loop = asyncio.get_running_loop()
 
-        return response
+        async def publish(spec):
+            spec = dict(spec)
+
+            for key in _BULK_RESERVED:
+                if key in spec:
+                    raise TypeError(f'{key!r} can\'t be set per page spec')
+
+            page_method = method or ('editPage' if 'path' in spec else 'createPage')
+            path = spec.pop('path') if page_method == 'editPage' else ''
+
+            with self._tgraph.track(page_method) as metrics:
+                values = await loop.run_in_executor(executor, functools.partial(
+                    page_values, return_content=return_content,
+                    html_engine=self.html_engine, metrics=metrics, **spec
+                ))
+
+                response = await self._publish(page_method, values, path,
+                                               metrics=metrics)
+
+                if return_content and return_html and 'content' in response:
+                    with timed(metrics, 'render'):
+                        response['content'] = await loop.run_in_executor(
+                            executor, nodes_to_html, response['content']
+                        )
+
+            return response
+
+        async for index, spec, result, error in imap_unordered(
+                publish, pages, concurrency):
+            yield BulkResult(index, spec, result, error)
 
     async def get_account_info(self, fields=None):
         """ Get information about a Telegraph account
@@ -462,9 +1765,12 @@ class TgGraph:
 
                        Default: [“short_name”,“author_name”,“author_url”]
         """
-        return (await self._tgraph.method('getAccountInfo', {
-            'fields': json_dumps(fields) if fields else None
-        }))
+        fields = json_dumpb(fields) if fields else None
+
+        return (await self._cached(
+            self._account_namespace(), fields.decode('utf-8') if fields else '',
+            'getAccountInfo', {'fields': fields}
+        ))
 
     async def get_page_list(self, offset=0, limit=50):
         """ Get a list of pages belonging to a Telegraph account
@@ -475,10 +1781,92 @@ class TgGraph:
         :param limit: Limits the number of pages to be retrieved
                       (0-200, default = 50)
         """
-        return (await self._tgraph.method('getPageList', {
-            'offset': offset,
-            'limit': limit
-        }))
+        return (await self._cached(
+            self._page_list_namespace(), '{}:{}'.format(offset, limit),
+            'getPageList', {'offset': offset, 'limit': limit}
+        ))
+
+    async def iter_pages(self, limit=200, lookahead=4, fetch_content=False,
+                         fetch_views=False, return_html=True, concurrency=8):
+        """ Iterate over all pages of the account, most recent first.
+            Async generator hiding get_page_list paging: once total_count
+            is known up to `lookahead` next windows are fetched
+            concurrently
+
+        :param limit: Pages per get_page_list request (0-200)
+        :param lookahead: Maximum number of windows fetched ahead
+        :param fetch_content: Also fetch the content of every page
+        :param fetch_views: Also fetch the total views of every page
+        :param return_html: Return content as HTML instead of Nodes list
+        :param concurrency: Maximum content/views requests per window
+        """
+        if lookahead < 1:
+            raise ValueError('lookahead must be at least 1')
+
+        first = await self.get_page_list(0, limit)
+        offsets = iter(range(limit, first['total_count'], limit))
+        pending = collections.deque()
+
+        async def fetch_window(offset):
+            pages = (await self.get_page_list(offset, limit))['pages']
+            return await self._expand_pages(pages, fetch_content, fetch_views,
+                                            return_html, concurrency)
+
+        def schedule():
+            while len(pending) < lookahead:
+                offset = next(offsets, None)
+
+                if offset is None:
+                    return
+
+                pending.append(asyncio.ensure_future(fetch_window(offset)))
+
+        try:
+            schedule()
+
+            for page in (await self._expand_pages(
+                    first['pages'], fetch_content, fetch_views, return_html,
+                    concurrency)):
+                yield page
+
+            while pending:
+                task = pending.popleft()
+                schedule()
+
+                for page in (await task):
+                    yield page
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _expand_pages(self, pages, fetch_content, fetch_views,
+                            return_html, concurrency):
+        if not (fetch_content or fetch_views) or not pages:
+            return pages
+
+        async def expand(page):
+            page = dict(page)
+
+            if fetch_content:
+                page['content'] = (await self.get_page(
+                    page['path'], True, return_html
+                ))['content']
+
+            if fetch_views:
+                page['views'] = (await self.get_views(page['path']))['views']
+
+            return page
+
+        result = list(pages)
+
+        async for index, _, page, error in imap_unordered(
+                expand, pages, concurrency):
+            if error is not None:
+                raise error
+
+            result[index] = page
+
+        return result
 
     async def get_views(self, path, year=None, month=None, day=None, hour=None):
         """ Get the number of views for a Telegraph article
@@ -500,6 +1888,131 @@ class TgGraph:
             'hour': hour
         }))
 
+    async def sync_mirror(self, limit=200, concurrency=8, batch=50):
+        """ Bring the mirror (see TgGraph(mirror=...)) up to date: pages
+            created since the last sync are listed until the first known
+            one, then the content of new pages and of pages edited with
+            edit_page is fetched. Views and pages edited elsewhere are not
+            refreshed. Returns {'new', 'fetched', 'total'} counts
+
+        :param limit: Pages per get_page_list request (0-200)
+        :param concurrency: Maximum number of getPage requests in flight
+        :param batch: Pages written to the mirror per transaction
+        """
+        mirror = self.mirror
+
+        if mirror is None:
+            raise ValueError('sync_mirror needs TgGraph(mirror=...)')
+
+        new_pages = []
+        numbers = []
+        seen = set()
+        offset = 0
+
+        while True:  # bypasses the cache, the list must be current
+            window = await self._tgraph.method(
+                'getPageList', {'offset': offset, 'limit': limit}
+            )
+            total = window['total_count']
+            known = False
+
+            for i, page in enumerate(window['pages']):
+                if page['path'] in seen:
+                    continue  # shifted by a page created meanwhile
+
+                if page['path'] in mirror:
+                    known = True
+                    break
+
+                seen.add(page['path'])
+                new_pages.append(page)
+                numbers.append(total - 1 - offset - i)
+
+            offset += limit
+
+            if known or offset >= total or not window['pages']:
+                break
+
+        # listed pages are stored first, a failed sync fetches their content later
+        mirror.put_many(new_pages, numbers)
+
+        async def fetch(path):
+            return await self._tgraph.method(
+                'getPage', {'return_content': True}, path
+            )
+
+        pages = []
+        fetched = 0
+
+        async for _, _, page, error in imap_unordered(
+                fetch, mirror.stale_paths(), concurrency):
+            if error is not None:
+                mirror.put_many(pages)
+                raise error
+
+            pages.append(page)
+
+            if len(pages) >= batch:
+                mirror.put_many(pages)
+                fetched += len(pages)
+                pages = []
+
+        mirror.put_many(pages)
+
+        return {'new': len(new_pages), 'fetched': fetched + len(pages),
+                'total': len(mirror)}
+
+    async def get_views_bulk(self, paths, buckets=((None,),), concurrency=8,
+                             store=None):
+        """ Get views of many pages over many time buckets, fanning out
+            getViews requests with bounded concurrency. Returns a
+            bcnadds.analytics.ViewsTable with a row per path and bucket
+
+        :param paths: Paths of the Telegraph pages
+        :param buckets: (year, month, day, hour) tuples, trailing items may
+                        be None or left out (e.g. from
+                        bcnadds.analytics.hour_buckets); default is all time
+        :param concurrency: Maximum number of requests in flight
+        :param store: bcnadds.analytics.ViewsStore, buckets that are over
+                      are read from it and never fetched again
+        """
+        buckets = [normalize_bucket(bucket) for bucket in buckets]
+        jobs = [(path, bucket) for path in paths for bucket in buckets]
+        views = [None] * len(jobs)
+        missing = []
+
+        for i, (path, bucket) in enumerate(jobs):
+            if store is not None:
+                views[i] = store.get(path, bucket)
+
+            if views[i] is None:
+                missing.append(i)
+
+        fetched = []
+
+        async def fetch(i):
+            path, bucket = jobs[i]
+            return (await self.get_views(path, *bucket))['views']
+
+        try:
+            async for _, i, result, error in imap_unordered(
+                    fetch, missing, concurrency):
+                if error is not None:
+                    raise error
+
+                views[i] = result
+                fetched.append(jobs[i] + (result,))
+        finally:
+            if store is not None:
+                store.put_many(fetched)
+
+        table = ViewsTable()
+
+        for (path, bucket), count in zip(jobs, views):
+            table.append(path, bucket, count)
+
+        return table
+
     async def file_upload(self, f):
         """ Upload file. NOT PART OF OFFICIAL API, USE AT YOUR OWN RISK
             Returns a list of dicts with `src` key.
@@ -509,3 +2022,58 @@ class TgGraph:
         :type f: file, str, or list
         """
         return (await self._tgraph.file_upload(f))
+
+    async def upload_files(self, files, concurrency=4, retries=2):
+        """ Upload many files in parallel, one request per file.
+            NOT PART OF OFFICIAL API, USE AT YOUR OWN RISK
+            Files are streamed from disk, a failed file is retried on its
+            own (network errors, and flood waits unless a scheduler
+            handles them). Returns a list of
+            BulkResult in input order, `result` is a dict with `src` key
+
+        :param files: Iterable of filenames, file-like objects
+                      or (file, name) tuples
+        :param concurrency: Maximum number of uploads in flight
+        :param retries: How many times one file is retried
+        """
+        results = []
+
+        async def upload(f):
+            return await self._upload_file(f, retries)
+
+        async for index, f, result, error in imap_unordered(
+                upload, files, concurrency):
+            results.append(BulkResult(index, f, result, error))
+
+        results.sort(key=lambda r: r.index)
+        return results
+
+    async def _upload_file(self, f, retries):
+        fp = f[0] if isinstance(f, tuple) else f
+        start = fp.tell() if hasattr(fp, 'seek') else None
+        attempt = 0
+
+        # a scheduler already waits out flood waits (or raises them on
+        # purpose), only connection problems are retried here then
+        if self._tgraph.scheduler is None:
+            retried = (RetryAfterError, httpx.TransportError)
+        else:
+            retried = httpx.TransportError
+
+        while True:
+            try:
+                return (await self._tgraph.file_upload(f))[0]
+            except retried as e:
+                if attempt >= retries:
+                    raise
+
+                if isinstance(e, RetryAfterError):
+                    delay = e.retry_after
+                else:
+                    delay = 2 ** attempt
+
+                attempt += 1
+                await asyncio.sleep(delay)
+
+                if start is not None:
+                    fp.seek(start)
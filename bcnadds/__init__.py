@@ -6,6 +6,7 @@ __copyright__ = "Copyright (C) 2023-present bcncalling <https://github.com/bcnca
 
 from .funcs import generate_cover
 from .TgGraph import TgGraph
+from .scheduler import RequestScheduler
 
 def bcnadds():
   print(
@@ -0,0 +1,179 @@
+import datetime
+import sqlite3
+import time
+from array import array
+
+NO_VALUE = -1  # stored for year/month/day/hour when not part of the bucket
+
+
+def hour_buckets(start, end):
+    """ (year, month, day, hour) buckets for every hour from `start`
+        up to and including `end` (datetimes)
+    """
+    current = start.replace(minute=0, second=0, microsecond=0)
+
+    while current <= end:
+        yield current.year, current.month, current.day, current.hour
+        current += datetime.timedelta(hours=1)
+
+
+def day_buckets(start, end):
+    """ (year, month, day, None) buckets for every day from `start`
+        up to and including `end` (dates or datetimes)
+    """
+    current = datetime.date(start.year, start.month, start.day)
+    end = datetime.date(end.year, end.month, end.day)
+
+    while current <= end:
+        yield current.year, current.month, current.day, None
+        current += datetime.timedelta(days=1)
+
+
+def normalize_bucket(bucket):
+    """Pad a (year[, month[, day[, hour]]]) tuple to four items"""
+    bucket = tuple(bucket) + (None,) * (4 - len(bucket))
+
+    if len(bucket) != 4:
+        raise ValueError(f'invalid views bucket {bucket!r}')
+
+    return bucket
+
+
+def bucket_end(bucket):
+    """ UTC timestamp at which a bucket is over, None for all-time views """
+    year, month, day, hour = bucket
+
+    if year is None:
+        return None
+
+    if month is None:
+        end = datetime.datetime(year + 1, 1, 1)
+    elif day is None:
+        end = datetime.datetime(year + month // 12, month % 12 + 1, 1)
+    elif hour is None:
+        end = datetime.datetime(year, month, day) + datetime.timedelta(days=1)
+    else:
+        end = datetime.datetime(year, month, day, hour) + datetime.timedelta(hours=1)
+
+    return end.replace(tzinfo=datetime.timezone.utc).timestamp()
+
+
+class ViewsTable(object):
+    """ Compact array-backed table of views, one row per (path, bucket)
+
+    Columns are arrays of ints, paths are stored once and referenced by
+    index; NO_VALUE marks a bucket part that wasn't requested.
+    """
+
+    __slots__ = ('paths', 'path_index', 'year', 'month', 'day', 'hour',
+                 'views', '_path_ids')
+
+    def __init__(self):
+        self.paths = []
+        self.path_index = array('l')
+        self.year = array('h')
+        self.month = array('b')
+        self.day = array('b')
+        self.hour = array('b')
+        self.views = array('q')
+
+        self._path_ids = {}
+
+    def append(self, path, bucket, views):
+        path_id = self._path_ids.get(path)
+
+        if path_id is None:
+            path_id = self._path_ids[path] = len(self.paths)
+            self.paths.append(path)
+
+        year, month, day, hour = bucket
+
+        self.path_index.append(path_id)
+        self.year.append(NO_VALUE if year is None else year)
+        self.month.append(NO_VALUE if month is None else month)
+        self.day.append(NO_VALUE if day is None else day)
+        self.hour.append(NO_VALUE if hour is None else hour)
+        self.views.append(views)
+
+    def __len__(self):
+        return len(self.views)
+
+    def __iter__(self):
+        """Yield (path, year, month, day, hour, views) rows"""
+        for i in range(len(self.views)):
+            yield (
+                self.paths[self.path_index[i]], self.year[i], self.month[i],
+                self.day[i], self.hour[i], self.views[i]
+            )
+
+    def total(self, path=None):
+        """Sum of views, of one path if given"""
+        if path is None:
+            return sum(self.views)
+
+        path_id = self._path_ids.get(path)
+
+        return sum(
+            v for i, v in zip(self.path_index, self.views) if i == path_id
+        )
+
+    def __repr__(self):
+        return f'<ViewsTable {len(self.paths)} paths, {len(self)} rows>'
+
+
+class ViewsStore(object):
+    """ Local time-series cache of page views in SQLite.
+        Only buckets that ended at least `settle` seconds ago are stored,
+        so they are never fetched again; current buckets are always fetched
+
+    :param filename: Database file (':memory:' for a per-process cache)
+    :param settle: Seconds after the end of a bucket before its count is
+                   considered final
+    """
+
+    __slots__ = ('connection', 'settle')
+
+    def __init__(self, filename=':memory:', settle=3600):
+        self.settle = settle
+        self.connection = sqlite3.connect(filename)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS views ('
+            ' path TEXT NOT NULL, year INTEGER NOT NULL, month INTEGER NOT NULL,'
+            ' day INTEGER NOT NULL, hour INTEGER NOT NULL, views INTEGER NOT NULL,'
+            ' PRIMARY KEY (path, year, month, day, hour))'
+        )
+
+    @staticmethod
+    def _key(path, bucket):
+        return (path,) + tuple(NO_VALUE if v is None else v for v in bucket)
+
+    def is_closed(self, bucket, now=None):
+        end = bucket_end(bucket)
+
+        if end is None:
+            return False
+
+        return end + self.settle <= (time.time() if now is None else now)
+
+    def get(self, path, bucket):
+        row = self.connection.execute(
+            'SELECT views FROM views WHERE path = ? AND year = ? AND month = ?'
+            ' AND day = ? AND hour = ?', self._key(path, bucket)
+        ).fetchone()
+
+        return row[0] if row else None
+
+    def put_many(self, items):
+        """Store (path, bucket, views) items of closed buckets"""
+        now = time.time()
+
+        with self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO views VALUES (?, ?, ?, ?, ?, ?)',
+                [self._key(path, bucket) + (views,)
+                 for path, bucket, views in items
+                 if self.is_closed(bucket, now)]
+            )
+
+    def close(self):
+        self.connection.close()
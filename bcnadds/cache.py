@@ -0,0 +1,376 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+
+class BaseCache(object):
+    """ Cache backend interface used by TgGraph
+
+    Entries are grouped into namespaces (e.g. one per page path) so that
+    all entries of a namespace can be invalidated at once.
+
+    :param ttl: Seconds an entry stays valid (None = until evicted)
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, namespace, name):
+        """Return the cached value or None"""
+        value = self._get(namespace, name)
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return value
+
+    def set(self, namespace, name, value, ttl=None):
+        """Store `value`, `ttl` overrides the default ttl"""
+        if ttl is None:
+            ttl = self.ttl
+
+        self._set(namespace, name, value, ttl)
+
+    def stats(self):
+        total = self.hits + self.misses
+
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'size': len(self),
+        }
+
+    def _get(self, namespace, name):
+        raise NotImplementedError
+
+    def _set(self, namespace, name, value, ttl):
+        raise NotImplementedError
+
+    def delete(self, namespace):
+        """Drop every entry of `namespace`"""
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+
+class MemoryCache(BaseCache):
+    """ In-memory LRU cache with TTL
+
+    :param maxsize: Maximum number of entries
+    :param ttl: Seconds an entry stays valid (None = until evicted)
+    """
+
+    def __init__(self, maxsize=1024, ttl=300):
+        BaseCache.__init__(self, ttl)
+
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # (namespace, name) -> (expires, value)
+        self._namespaces = {}  # namespace -> set of names
+
+    def _get(self, namespace, name):
+        key = (namespace, name)
+        entry = self._entries.get(key)
+
+        if entry is None:
+            return None
+
+        expires, value = entry
+
+        if expires is not None and expires <= time.monotonic():
+            self._remove(key)
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def _set(self, namespace, name, value, ttl):
+        key = (namespace, name)
+        expires = time.monotonic() + ttl if ttl is not None else None
+
+        self._entries[key] = (expires, value)
+        self._entries.move_to_end(key)
+        self._namespaces.setdefault(namespace, set()).add(name)
+
+        while len(self._entries) > self.maxsize:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        del self._entries[key]
+
+        names = self._namespaces[key[0]]
+        names.discard(key[1])
+
+        if not names:
+            del self._namespaces[key[0]]
+
+    def delete(self, namespace):
+        for name in self._namespaces.pop(namespace, ()):
+            del self._entries[(namespace, name)]
+
+    def clear(self):
+        self._entries.clear()
+        self._namespaces.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _digest(s):
+    return hashlib.sha1(s.encode('utf-8')).hexdigest()
+
+
+class DiskCache(BaseCache):
+    """ On-disk cache storing every entry as a JSON file, survives restarts.
+        Values have to be JSON serializable (API results are)
+
+    :param directory: Cache directory, created if missing
+    :param ttl: Seconds an entry stays valid (None = forever)
+    """
+
+    def __init__(self, directory, ttl=3600):
+        BaseCache.__init__(self, ttl)
+
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, namespace, name=None):
+        path = os.path.join(self.directory, _digest(namespace))
+
+        if name is None:
+            return path
+
+        return os.path.join(path, _digest(name) + '.json')
+
+    def _get(self, namespace, name):
+        path = self._path(namespace, name)
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if entry['expires'] is not None and entry['expires'] <= time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+        return entry['value']
+
+    def _set(self, namespace, name, value, ttl):
+        path = self._path(namespace, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        entry = {
+            'expires': time.time() + ttl if ttl is not None else None,
+            'value': value
+        }
+
+        tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, separators=(',', ':'), ensure_ascii=False)
+
+        os.replace(tmp_path, path)
+
+    def delete(self, namespace):
+        shutil.rmtree(self._path(namespace), ignore_errors=True)
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    def __len__(self):
+        return sum(
+            len(files) for _, _, files in os.walk(self.directory)
+        )
+
+
+class BlobCache(object):
+    """ Size-bounded LRU cache of bytes values keyed by strings, the
+        least recently used entries are evicted past `max_bytes`.
+        Safe to use from several threads
+
+    :param max_bytes: Total size of the values kept
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        self._sizes = OrderedDict()  # key -> size, least recently used first
+        self.size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached bytes or None"""
+        with self._lock:
+            value = self._get(key) if key in self._sizes else None
+
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._sizes.move_to_end(key)
+
+            return value
+
+    def set(self, key, value):
+        """Store `value`, values larger than max_bytes aren't stored"""
+        if len(value) > self.max_bytes:
+            return
+
+        with self._lock:
+            self._discard(key)
+            self._set(key, value)
+            self._sizes[key] = len(value)
+            self.size += len(value)
+
+            while self.size > self.max_bytes:
+                self._discard(next(iter(self._sizes)))
+
+    def _discard(self, key):
+        size = self._sizes.pop(key, None)
+
+        if size is not None:
+            self.size -= size
+            self._remove(key)
+
+    def stats(self):
+        total = self.hits + self.misses
+
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'size': len(self),
+            'bytes': self.size,
+        }
+
+    def _get(self, key):
+        raise NotImplementedError
+
+    def _set(self, key, value):
+        raise NotImplementedError
+
+    def _remove(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._sizes):
+                self._discard(key)
+
+    def __contains__(self, key):
+        return key in self._sizes
+
+    def __len__(self):
+        return len(self._sizes)
+
+
+class MemoryBlobCache(BlobCache):
+    """ BlobCache keeping the values in memory
+
+    :param max_bytes: Total size of the values kept
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        BlobCache.__init__(self, max_bytes)
+
+        self._values = {}
+
+    def _get(self, key):
+        return self._values.get(key)
+
+    def _set(self, key, value):
+        self._values[key] = value
+
+    def _remove(self, key):
+        self._values.pop(key, None)
+
+
+class DiskBlobCache(BlobCache):
+    """ BlobCache storing every value in a file, survives restarts.
+        Recency is kept in the file modification times, entries left by
+        an earlier run are picked up oldest first
+
+    :param directory: Cache directory, created if missing
+    :param max_bytes: Total size of the files kept
+    """
+
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024):
+        BlobCache.__init__(self, max_bytes)
+
+        self.directory = os.path.abspath(directory)
+        os.makedirs(directory, exist_ok=True)
+
+        entries = []
+
+        for entry in os.scandir(directory):
+            if entry.is_file() and entry.name.endswith('.bin'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+
+        for _, name, size in sorted(entries):
+            self._sizes[name] = size
+            self.size += size
+
+        while self.size > self.max_bytes:
+            self._discard(next(iter(self._sizes)))
+
+    def _path(self, name):
+        return os.path.join(self.directory, name + '.bin')
+
+    def get(self, key):
+        return BlobCache.get(self, _digest(key))
+
+    def set(self, key, value):
+        BlobCache.set(self, _digest(key), value)
+
+    def __contains__(self, key):
+        return BlobCache.__contains__(self, _digest(key))
+
+    def _get(self, name):
+        path = self._path(name)
+
+        try:
+            with open(path, 'rb') as f:
+                value = f.read()
+
+            os.utime(path)
+        except OSError:  # removed behind our back
+            self.size -= self._sizes.pop(name)
+            return None
+
+        return value
+
+    def _set(self, name, value):
+        path = self._path(name)
+        tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+
+        with open(tmp_path, 'wb') as f:
+            f.write(value)
+
+        os.replace(tmp_path, path)
+
+    def _remove(self, name):
+        try:
+            os.remove(self._path(name))
+        except OSError:
+            pass
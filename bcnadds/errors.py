@@ -14,7 +14,33 @@ class InvalidHTML(ParsingException):
     pass
 
 
+class ContentTooLarge(ParsingException):
+    def __init__(self, size: int, limit: int):
+        self.size = size
+        self.limit = limit
+        super().__init__(f'Content is at least {size} bytes, limit is {limit} bytes')
+
+
 class RetryAfterError(TelegraphException):
     def __init__(self, retry_after: int):
         self.retry_after = retry_after
         super().__init__(f'Telegram says floodwait. Retry in {retry_after} seconds')
+
+
+class ThumbnailError(Exception):
+    def __init__(self, url: str, reason: str, status: int = None):
+        self.url = url
+        self.reason = reason
+        self.status = status
+        super().__init__(f'Failed to download thumbnail {url}: {reason}')
+
+
+class LongPageError(TelegraphException):
+    def __init__(self, step: str, pages: list, results: list, errors: list):
+        self.step = step
+        self.pages = pages
+        self.results = results
+        self.errors = errors
+        super().__init__(
+            f'{len(errors)} of {len(pages)} parts failed at {step}: {errors[0]!r}'
+        )
@@ -1,22 +1,24 @@
 #thumbnails
+import asyncio
+import contextlib
+import functools
+import hashlib
 import os
 import re
 import textwrap
-import aiofiles
+import threading
+import time
 import aiohttp
 import numpy as np
-import random
-from PIL import Image, ImageChops, ImageOps, ImageDraw, ImageEnhance, ImageFilter, ImageFont
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from io import BytesIO
+from PIL import Image, ImageChops, ImageOps, ImageDraw, ImageFilter, ImageFont
 from youtubesearchpython.__future__ import VideosSearch
 from assets import colors
 
-def changeImageSize(maxWidth, maxHeight, image):
-    widthRatio = maxWidth / image.size[0]
-    heightRatio = maxHeight / image.size[1]
-    newWidth = int(widthRatio * image.size[0])
-    newHeight = int(heightRatio * image.size[1])
-    newImage = image.resize((newWidth, newHeight))
-    return newImage
+from .cache import DiskBlobCache, MemoryBlobCache
+from .errors import ThumbnailError
+from .utils import SingleFlight
 
 def changeImageSize(maxWidth, maxHeight, image):
     widthRatio = maxWidth / image.size[0]
@@ -26,109 +28,728 @@ def changeImageSize(maxWidth, maxHeight, image):
     newImage = image.resize((newWidth, newHeight))
     return newImage
 
-def add_corners(im):
-    bigsize = (im.size[0] * 3, im.size[1] * 3)
+@functools.lru_cache(maxsize=16)
+def circle_mask(size):
+    """ Anti-aliased circle mask of `size`, drawn 3x larger and scaled
+        down once per size. Shared, don't modify it
+    """
+    bigsize = (size[0] * 3, size[1] * 3)
     mask = Image.new("L", bigsize, 0)
     ImageDraw.Draw(mask).ellipse((0, 0) + bigsize, fill=255)
-    mask = mask.resize(im.size, Image.ANTIALIAS)
-    mask = ImageChops.darker(mask, im.split()[-1])
+    return mask.resize(size, Image.ANTIALIAS)
+
+def add_corners(im):
+    mask = ImageChops.darker(circle_mask(im.size), im.split()[-1])
     im.putalpha(mask)
 
-async def generate_cover(requested_by, title, views, duration, thumbnail):
-    async with aiohttp.ClientSession() as session:
-        async with session.get(thumbnail) as resp:
-            if resp.status == 200:
-                f = await aiofiles.open("cache/thumbx.png", mode="wb")
-                await f.write(await resp.read())
-                await f.close()
-
-    border = random.choice(colors)
-    image1 = Image.open("cache/thumbx.png")
-    image2 = Image.open(f"Telugucoders/core/resource/amala.png")
-    image3 = changeImageSize(1280, 720, image1)
-    image4 = changeImageSize(1280, 720, image2)
-    image5 = image3.convert("RGBA")
-    image6 = image3.convert("RGBA")
-    background = image5.filter(filter=ImageFilter.BoxBlur(30))
-    enhancer = ImageEnhance.Brightness(background)
-    background = enhancer.enhance(0.6)
-    background.save("cache/blur_image.png")
-
-    Xcenter = image3.width / 2
-    Ycenter = image3.height / 2
-    x1 = Xcenter - 250
-    y1 = Ycenter - 250
-    x2 = Xcenter + 250
-    y2 = Ycenter + 250
-
-    logo = image3.crop((x1, y1, x2, y2))
-    logo.thumbnail((520, 520), Image.ANTIALIAS)
-    logo.save(f"cache/temp.png")
-    if not os.path.isfile(f"cache/circle.png"):
-        im = Image.open(f"cache/temp.png").convert("RGBA")
-        add_corners(im)
-        im.save(f"cache/circle.png")
-
-    image7 = Image.open(f"cache/circle.png")
-    image8 = image7.convert("RGBA")
-    image8.thumbnail((365, 365), Image.ANTIALIAS)
-    width = int((1280 - 365) / 2)
-    background = Image.open("cache/blur_image.png")
-    background.paste(image8, (width + 2, 138), mask=image8)
-    background.paste(image4, (0, 0), mask=image4)
-    img = ImageOps.expand(background, border=10, fill=f"{border}")
-    draw = ImageDraw.Draw(img)
-    font = ImageFont.truetype("Telugucoders/core/resource/font2.ttf", 45)
-    ImageFont.truetype("Telugucoders/core/resource/font2.ttf", 70)
-    arial = ImageFont.truetype("Telugucoders/core/resource/font2.ttf", 30)
-    ImageFont.truetype("Telugucoders/core/resource/font.ttf", 30)
-
-    para = textwrap.wrap(title, width=32)
+# ImageEnhance.Brightness(image).enhance(0.6) as a lookup table, so the
+# background is darkened in one point() pass. Built with Image.blend like
+# Brightness does, the result is the same to the bit
+_BRIGHTNESS = list(Image.blend(
+    Image.new("L", (256, 1), 0), Image.frombytes("L", (256, 1), bytes(range(256))), 0.6
+).getdata())
+
+# The background is blurred this many times smaller and scaled back up, 1
+# blurs it at full size (bit for bit the output of earlier versions).
+# Larger values are approximate: on sharp thumbnails (1px stripes) the edges
+# of the background differ by up to 39 per channel, and with the RGB blur
+# and the lookup table a full size blur is about as fast anyway
+BACKGROUND_SCALE = 1
+
+def blurred_background(image, scale=BACKGROUND_SCALE):
+    """ `image` box blurred with radius 30 and darkened to 60%, as RGBA """
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA")
+
+    if scale > 1:
+        background = image.reduce(scale).filter(ImageFilter.BoxBlur(30 / scale))
+    else:
+        background = image.filter(ImageFilter.BoxBlur(30))
+
+    if image.mode == "RGB":
+        background = background.point(_BRIGHTNESS * 3)
+    else:  # Brightness keeps the alpha band
+        background = background.point(_BRIGHTNESS * 3 + list(range(256)))
+
+    if scale > 1:
+        background = background.resize(image.size, Image.BILINEAR)
+
+    if background.mode == "RGB":
+        background.putalpha(255)
+
+    return background
+
+LEGACY_OUTPUT = "final.png"
+
+DEFAULT_RESOURCES = "Telugucoders/core/resource"
+
+
+class CoverAssets(object):
+    """ Overlays, fonts and border colours of generate_cover, loaded once
+        and reused by every render. Overlays are scaled once per size and
+        shared read-only; FreeType fonts aren't thread safe, so every
+        thread loads its own copy once per size. Sent to a process pool
+        only the paths travel, each worker keeps its own loaded copy
+
+    :param resource_dir: Directory of the overlay and font files
+    :param overlay: Overlay image file, pasted over the background
+    :param font: TrueType font of the title and duration
+    :param colors: Border colours generate_cover picks from
+    """
+
+    __slots__ = ("resource_dir", "overlay_file", "font_file", "colors",
+                 "_lock", "_overlays", "_local", "_fingerprint")
+
+    def __init__(self, resource_dir=DEFAULT_RESOURCES, overlay="amala.png",
+                 font="font2.ttf", colors=colors):
+        self.resource_dir = resource_dir
+        self.overlay_file = overlay
+        self.font_file = font
+        self.colors = tuple(colors)
+
+        self._lock = threading.Lock()
+        self._overlays = {}
+        self._local = threading.local()
+        self._fingerprint = None
+
+    def _key(self):
+        return self.resource_dir, self.overlay_file, self.font_file, self.colors
+
+    def __reduce__(self):
+        return _shared_assets, self._key()
+
+    def path(self, name):
+        return os.path.join(self.resource_dir, name)
+
+    def overlay(self, size=(1280, 720)):
+        image = self._overlays.get(size)
+
+        if image is None:
+            with self._lock:
+                image = self._overlays.get(size)
+
+                if image is None:
+                    with Image.open(self.path(self.overlay_file)) as f:
+                        image = changeImageSize(size[0], size[1], f)
+
+                    if image.mode != "RGBA":
+                        image = image.convert("RGBA")
+
+                    self._overlays[size] = image
+
+        return image
+
+    def font(self, size):
+        fonts = getattr(self._local, "fonts", None)
+
+        if fonts is None:
+            fonts = self._local.fonts = {}
+
+        font = fonts.get(size)
+
+        if font is None:
+            font = fonts[size] = ImageFont.truetype(self.path(self.font_file), size)
+
+        return font
+
+    def fingerprint(self):
+        """ Hex digest of the configuration and the asset files sizes and
+            modification times, part of the rendered-cover cache keys
+        """
+        if self._fingerprint is None:
+            h = hashlib.sha256(repr(self._key()).encode("utf-8"))
+
+            for name in (self.overlay_file, self.font_file):
+                try:
+                    stat = os.stat(self.path(name))
+                    h.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+                except OSError:
+                    h.update(b"-")
+
+            self._fingerprint = h.hexdigest()
+
+        return self._fingerprint
+
+    def preload(self):
+        """Load what a 1280x720 cover needs now instead of on first use"""
+        self.overlay()
+        self.font(45)
+        self.font(30)
+        return self
+
+
+_assets_lock = threading.Lock()
+_assets = {}  # key -> CoverAssets, one per configuration and process
+_default_assets = None
+
+
+def _shared_assets(*key):
+    with _assets_lock:
+        assets = _assets.get(key)
+
+        if assets is None:
+            assets = _assets[key] = CoverAssets(*key)
+
+        return assets
+
+
+def configure_cover_assets(resource_dir=DEFAULT_RESOURCES, overlay="amala.png",
+                           font="font2.ttf", colors=colors):
+    """Set the assets generate_cover uses by default"""
+    global _default_assets
+
+    _default_assets = _shared_assets(resource_dir, overlay, font, tuple(colors))
+    return _default_assets
+
+
+def get_cover_assets():
+    if _default_assets is None:
+        return configure_cover_assets()
+
+    return _default_assets
+
+
+@contextlib.contextmanager
+def _stage(timings, name):
+    if timings is None:
+        yield
+        return
+
+    start = time.perf_counter()
     try:
-        draw.text(
-            (450, 35),
-            f"STARTED PLAYING",
-            fill="white",
-            stroke_width=1,
-            stroke_fill="white",
-            font=font,
-        )
-        if para[0]:
-            text_w, text_h = draw.textsize(f"{para[0]}", font=font)
-            draw.text(
-                ((1280 - text_w) / 2, 560),
-                f"{para[0]}",
-                fill="white",
-                stroke_width=1,
-                stroke_fill="white",
-                font=font,
-            )
-        if para[1]:
-            text_w, text_h = draw.textsize(f"{para[1]}", font=font)
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+
+
+def render_cover(thumbnail, title, duration, border, timings=None,
+                 assets=None, background_scale=BACKGROUND_SCALE):
+    """ Composite a cover in memory from the thumbnail image bytes,
+        background_scale=1 renders exactly like earlier versions
+    """
+    if assets is None:
+        assets = get_cover_assets()
+
+    with _stage(timings, "decode"):
+        image1 = Image.open(BytesIO(thumbnail))
+        image1.load()
+
+    with _stage(timings, "resize"):
+        image3 = changeImageSize(1280, 720, image1)
+        image4 = assets.overlay((1280, 720))
+
+    with _stage(timings, "background"):
+        background = blurred_background(image3, background_scale)
+
+    with _stage(timings, "circle"):
+        Xcenter = image3.width / 2
+        Ycenter = image3.height / 2
+        x1 = Xcenter - 250
+        y1 = Ycenter - 250
+        x2 = Xcenter + 250
+        y2 = Ycenter + 250
+
+        logo = image3.crop((x1, y1, x2, y2))
+        logo.thumbnail((520, 520), Image.ANTIALIAS)
+
+        if logo.mode == "RGB":  # opaque, the mask is the alpha band as is
+            image8 = logo
+            image8.putalpha(circle_mask(logo.size))
+        else:
+            image8 = logo.convert("RGBA")
+            add_corners(image8)
+
+        image8.thumbnail((365, 365), Image.ANTIALIAS)
+
+    with _stage(timings, "composite"):
+        width = int((1280 - 365) / 2)
+        background.paste(image8, (width + 2, 138), mask=image8)
+        background.paste(image4, (0, 0), mask=image4)
+        img = ImageOps.expand(background, border=10, fill=f"{border}")
+
+    with _stage(timings, "fonts"):
+        font = assets.font(45)
+        arial = assets.font(30)
+
+    with _stage(timings, "text"):
+        draw = ImageDraw.Draw(img)
+        para = textwrap.wrap(title, width=32)
+        try:
             draw.text(
-                ((1280 - text_w) / 2, 610),
-                f"{para[1]}",
+                (450, 35),
+                f"STARTED PLAYING",
                 fill="white",
                 stroke_width=1,
                 stroke_fill="white",
                 font=font,
             )
-    except:
-        pass
-    text_w, text_h = draw.textsize(f"Duration: {duration} Mins", font=arial)
-    draw.text(
-        ((1280 - text_w) / 2, 665),
-        f"Duration: {duration} Mins",
-        fill="white",
-        font=arial,
-    )
+            if para[0]:
+                text_w, text_h = draw.textsize(f"{para[0]}", font=font)
+                draw.text(
+                    ((1280 - text_w) / 2, 560),
+                    f"{para[0]}",
+                    fill="white",
+                    stroke_width=1,
+                    stroke_fill="white",
+                    font=font,
+                )
+            if para[1]:
+                text_w, text_h = draw.textsize(f"{para[1]}", font=font)
+                draw.text(
+                    ((1280 - text_w) / 2, 610),
+                    f"{para[1]}",
+                    fill="white",
+                    stroke_width=1,
+                    stroke_fill="white",
+                    font=font,
+                )
+        except:
+            pass
+        text_w, text_h = draw.textsize(f"Duration: {duration} Mins", font=arial)
+        draw.text(
+            ((1280 - text_w) / 2, 665),
+            f"Duration: {duration} Mins",
+            fill="white",
+            font=arial,
+        )
+
+    return img
+
+
+def save_cover(img, output=None, timings=None):
+    """ Encode a cover as PNG. output: None for a BytesIO named final.png,
+        bytes for bytes, a path or a binary file object to write to
+    """
+    with _stage(timings, "encode"):
+        if output is None or output is bytes:
+            buffer = BytesIO()
+            img.save(buffer, "PNG")
+
+            if output is bytes:
+                return buffer.getvalue()
+
+            buffer.name = LEGACY_OUTPUT
+            buffer.seek(0)
+            return buffer
+
+        if isinstance(output, (str, os.PathLike)):
+            img.save(output)
+        else:
+            img.save(output, "PNG")
+
+        return output
+
+
+async def _close_on_cancel(session):
+    """ Wait until cancelled, then close `session`. asyncio.run cancels
+        the tasks left when the main coroutine returns, so sessions are
+        closed on their own loop before it's closed
+    """
     try:
-        os.remove(f"cache/temp.png")
-        os.remove(f"cache/circle.png")
-        os.remove(f"cache/temp_image.png")
-        os.remove(f"background.png")
-    except:
-        pass
-    img.save(f"final.png")
-    final = f"final.png"
-    return final
+        await asyncio.get_running_loop().create_future()
+    finally:
+        await session.close()
+
+
+class ThumbnailFetcher(object):
+    """ Downloads thumbnails through one pooled aiohttp session, keeps
+        them in a size-bounded on-disk LRU cache keyed by URL, and joins
+        concurrent downloads of the same URL into one. Failed downloads
+        raise ThumbnailError and are never cached
+
+    :param cache: DiskBlobCache (or another BlobCache), None to not cache
+    :param timeout: Seconds a download may take
+    :param max_size: Largest thumbnail accepted, in bytes
+    :param limit: Maximum number of simultaneous connections
+    """
+
+    __slots__ = ("cache", "timeout", "max_size", "limit", "_session",
+                 "_loop", "_closer", "_flight")
+
+    def __init__(self, cache=None, timeout=15, max_size=8 * 1024 * 1024,
+                 limit=20):
+        self.cache = cache
+        self.timeout = timeout
+        self.max_size = max_size
+        self.limit = limit
+
+        self._session = None
+        self._loop = None
+        self._closer = None
+        self._flight = SingleFlight()
+
+    def _get_session(self):
+        loop = asyncio.get_running_loop()
+
+        # sessions are bound to the loop they were created in
+        if self._session is None or self._session.closed or self._loop is not loop:
+            self._drop_session()
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.limit),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+            self._loop = loop
+            self._closer = loop.create_task(_close_on_cancel(self._session))
+
+        return self._session
+
+    def _drop_session(self):
+        """Close a session left behind by another event loop"""
+        session, loop, closer = self._session, self._loop, self._closer
+        self._session = self._loop = self._closer = None
+
+        if session is None or session.closed:
+            return
+
+        if loop.is_running():  # in another thread
+            loop.call_soon_threadsafe(closer.cancel)
+        else:
+            # its loop stopped without cancelling the closer, nothing
+            # can be awaited there any more
+            session.detach()
+
+    async def fetch(self, url):
+        """Thumbnail bytes of `url`, from the cache when possible"""
+        if self.cache is not None:
+            # disk reads and writes go to the default executor
+            data = await asyncio.get_running_loop().run_in_executor(
+                None, self.cache.get, url
+            )
+
+            if data is not None:
+                return data
+
+        return await self._flight.do(url, lambda: self._download(url))
+
+    async def _download(self, url):
+        try:
+            async with self._get_session().get(url) as resp:
+                if resp.status != 200:
+                    raise ThumbnailError(url, f"HTTP {resp.status}", resp.status)
+
+                if (resp.content_length or 0) > self.max_size:
+                    raise ThumbnailError(
+                        url, f"{resp.content_length} bytes, limit is {self.max_size}"
+                    )
+
+                chunks = []
+                size = 0
+
+                async for chunk in resp.content.iter_any():
+                    size += len(chunk)
+
+                    if size > self.max_size:
+                        raise ThumbnailError(
+                            url, f"more than the {self.max_size} bytes limit"
+                        )
+
+                    chunks.append(chunk)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise ThumbnailError(url, str(e) or type(e).__name__) from e
+
+        data = b"".join(chunks)
+
+        if not data:
+            raise ThumbnailError(url, "empty response")
+
+        if self.cache is not None:
+            await asyncio.get_running_loop().run_in_executor(
+                None, self.cache.set, url, data
+            )
+
+        return data
+
+    async def close(self):
+        if self._loop is not asyncio.get_running_loop():
+            self._drop_session()
+            return
+
+        closer = self._closer
+        self._session = self._loop = self._closer = None
+
+        if closer is not None:
+            closer.cancel()
+            await asyncio.gather(closer, return_exceptions=True)
+
+
+_fetcher = None
+
+
+def configure_thumbnail_fetcher(directory="cache/thumbnails",
+                                max_bytes=64 * 1024 * 1024, **kwargs):
+    """ Set the fetcher download_thumbnail uses, `directory` None to not
+        cache thumbnails; other arguments are passed to ThumbnailFetcher
+    """
+    global _fetcher
+
+    cache = None if directory is None else DiskBlobCache(directory, max_bytes)
+    _fetcher = ThumbnailFetcher(cache, **kwargs)
+    return _fetcher
+
+
+def get_thumbnail_fetcher():
+    if _fetcher is None:
+        return configure_thumbnail_fetcher()
+
+    return _fetcher
+
+
+async def close_thumbnail_fetcher():
+    """Close the session of the default fetcher, before the loop stops"""
+    if _fetcher is not None:
+        await _fetcher.close()
+
+
+async def download_thumbnail(thumbnail):
+    return await get_thumbnail_fetcher().fetch(thumbnail)
+
+
+class CoverCache(object):
+    """ Encoded covers by fingerprint of their inputs (see cover_key),
+        in a memory tier in front of a disk tier, both size-bounded LRU
+
+    :param memory: MemoryBlobCache or None
+    :param disk: DiskBlobCache or None
+    """
+
+    __slots__ = ("memory", "disk")
+
+    def __init__(self, memory=None, disk=None):
+        self.memory = memory
+        self.disk = disk
+
+    def get(self, key):
+        if self.memory is not None:
+            data = self.memory.get(key)
+
+            if data is not None:
+                return data
+
+        if self.disk is not None:
+            data = self.disk.get(key)
+
+            if data is not None and self.memory is not None:
+                self.memory.set(key, data)
+
+            return data
+
+        return None
+
+    def set(self, key, data):
+        if self.memory is not None:
+            self.memory.set(key, data)
+
+        if self.disk is not None:
+            self.disk.set(key, data)
+
+    async def aget(self, key):
+        """get() answering memory hits at once, disk reads in the default executor"""
+        if self.memory is not None:
+            data = self.memory.get(key)
+
+            if data is not None:
+                return data
+
+        if self.disk is None:
+            return None
+
+        data = await asyncio.get_running_loop().run_in_executor(
+            None, self.disk.get, key
+        )
+
+        if data is not None and self.memory is not None:
+            self.memory.set(key, data)
+
+        return data
+
+    async def aset(self, key, data):
+        """set() writing the disk tier in the default executor"""
+        if self.memory is not None:
+            self.memory.set(key, data)
+
+        if self.disk is not None:
+            await asyncio.get_running_loop().run_in_executor(
+                None, self.disk.set, key, data
+            )
+
+    def stats(self):
+        return {
+            "memory": None if self.memory is None else self.memory.stats(),
+            "disk": None if self.disk is None else self.disk.stats(),
+        }
+
+
+_cover_cache = None
+_cover_cache_configured = False
+
+
+def configure_cover_cache(memory_bytes=32 * 1024 * 1024,
+                          directory="cache/covers",
+                          disk_bytes=256 * 1024 * 1024):
+    """ Set the cache generate_cover keeps rendered covers in.
+        memory_bytes or directory None leaves that tier out, without
+        both covers aren't cached
+    """
+    global _cover_cache, _cover_cache_configured
+
+    memory = None if memory_bytes is None else MemoryBlobCache(memory_bytes)
+    disk = None if directory is None else DiskBlobCache(directory, disk_bytes)
+
+    _cover_cache = None if memory is None and disk is None else CoverCache(memory, disk)
+    _cover_cache_configured = True
+    return _cover_cache
+
+
+def get_cover_cache():
+    if not _cover_cache_configured:
+        return configure_cover_cache()
+
+    return _cover_cache
+
+
+def pick_border(title, digest, colors):
+    """Border colour of a cover, always the same for the same title and thumbnail"""
+    h = hashlib.sha256(title.encode("utf-8") + digest).digest()
+    return colors[int.from_bytes(h[:4], "big") % len(colors)]
+
+
+def cover_key(title, duration, border, digest, assets):
+    """Cache key of a cover, `digest` is the sha256 digest of the thumbnail"""
+    h = hashlib.sha256()
+
+    for part in (title, str(duration), str(border), digest.hex(),
+                 assets.fingerprint(), str(BACKGROUND_SCALE)):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+
+    return h.hexdigest()
+
+
+def _deliver(data, output):
+    """Return or write encoded cover bytes the way save_cover does"""
+    if output is bytes:
+        return data
+
+    if output is None:
+        output = BytesIO(data)
+        output.name = LEGACY_OUTPUT
+    elif isinstance(output, (str, os.PathLike)):
+        with open(output, "wb") as f:
+            f.write(data)
+    else:
+        output.write(data)
+
+    return output
+
+
+async def _deliver_async(data, output):
+    """_deliver with files written in the default executor"""
+    if isinstance(output, (str, os.PathLike)):
+        return await asyncio.get_running_loop().run_in_executor(
+            None, _deliver, data, output
+        )
+
+    return _deliver(data, output)
+
+
+def _render(thumbnail, title, duration, border, output, assets):
+    img = render_cover(thumbnail, title, duration, border, assets=assets)
+    return save_cover(img, output)
+
+
+_pool = None
+_pool_mode = "thread"
+
+
+def configure_cover_pool(mode="thread", workers=None):
+    """ Where generate_cover renders: "thread" or "process" pool with
+        `workers` workers, or None to render on the event loop.
+        Process pools use every core, threads only overlap the parts
+        where Pillow releases the GIL
+    """
+    global _pool, _pool_mode
+
+    if mode not in ("thread", "process", None):
+        raise ValueError(f"unknown cover pool mode {mode!r}")
+
+    shutdown_cover_pool()
+    _pool_mode = mode
+
+    if mode == "thread":
+        _pool = ThreadPoolExecutor(workers, thread_name_prefix="cover")
+    elif mode == "process":
+        _pool = ProcessPoolExecutor(workers)
+
+    return _pool
+
+
+def shutdown_cover_pool(wait=True):
+    global _pool
+
+    if _pool is not None:
+        _pool.shutdown(wait=wait)
+        _pool = None
+
+
+def _get_pool():
+    if _pool is None and _pool_mode is not None:
+        configure_cover_pool(_pool_mode)
+
+    return _pool
+
+
+async def generate_cover(requested_by, title, views, duration, thumbnail,
+                         output=None, border=None, assets=None):
+    """ Render a "now playing" cover in memory, off the event loop (see
+        configure_cover_pool), concurrent calls don't share any state.
+        Returns a BytesIO named final.png by default; output=bytes returns
+        bytes, a path or file object is written to and returned.
+        output=LEGACY_OUTPUT writes final.png and returns its name like
+        earlier versions. `assets` overrides get_cover_assets().
+        The thumbnail is fetched with get_thumbnail_fetcher(), a failed
+        download raises ThumbnailError. Without `border` the colour is
+        picked from the title and thumbnail, so covers already rendered
+        are served from get_cover_cache()
+    """
+    data = await download_thumbnail(thumbnail)
+    digest = hashlib.sha256(data).digest()
+
+    if assets is None:
+        assets = get_cover_assets()
+
+    if border is None:
+        border = pick_border(title, digest, assets.colors)
+
+    cache = get_cover_cache()
+    key = None
+
+    if cache is not None:
+        key = cover_key(title, duration, border, digest, assets)
+        cached = await cache.aget(key)
+
+        if cached is not None:
+            return await _deliver_async(cached, output)
+
+    pool = _get_pool()
+
+    if key is None and pool is None:
+        return _render(data, title, duration, border, output, assets)
+
+    if key is None and (_pool_mode == "thread" or isinstance(output, (str, os.PathLike))):
+        return await asyncio.get_running_loop().run_in_executor(
+            pool, _render, data, title, duration, border, output, assets
+        )
+
+    # buffers and file objects can't be sent to another process, and
+    # cached covers are kept encoded
+    if pool is None:
+        result = _render(data, title, duration, border, bytes, assets)
+    else:
+        result = await asyncio.get_running_loop().run_in_executor(
+            pool, _render, data, title, duration, border, bytes, assets
+        )
+
+    if key is not None:
+        await cache.aset(key, result)
+
+    return await _deliver_async(result, output)
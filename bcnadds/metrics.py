@@ -0,0 +1,209 @@
+import contextlib
+import math
+import threading
+import time
+
+
+class CallMetrics(object):
+    """ Measurements of one Telegraph call, passed to observers
+
+    Times are in seconds: `parse` (html_to_nodes), `serialize`
+    (json_dumps), `network` (request and response decoding, summed over
+    attempts), `render` (nodes_to_html) and `total`. `attempts` counts
+    requests sent, `coalesced` is set when the call shared another
+    call's request.
+    """
+
+    __slots__ = ('method', 'domain', 'request_bytes', 'response_bytes',
+                 'parse', 'serialize', 'network', 'render', 'total',
+                 'attempts', 'flood_waits', 'coalesced', 'error')
+
+    def __init__(self, method):
+        self.method = method
+        self.domain = None
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.parse = 0.0
+        self.serialize = 0.0
+        self.network = 0.0
+        self.render = 0.0
+        self.total = 0.0
+        self.attempts = 0
+        self.flood_waits = 0
+        self.coalesced = False
+        self.error = None
+
+    @property
+    def retries(self):
+        return max(self.attempts - 1, 0)
+
+    def __repr__(self):
+        return '<CallMetrics {} {} total={:.4f}s attempts={}>'.format(
+            self.method, self.domain, self.total, self.attempts
+        )
+
+
+class Observer(object):
+    """ Base class for TgGraph instrumentation hooks, override what's needed.
+        Hooks are called synchronously and should return quickly
+    """
+
+    def on_call(self, metrics):
+        """Called once per finished call (also on errors, see metrics.error)"""
+
+    def on_flood_wait(self, metrics, retry_after):
+        """Called when the API answers FLOOD_WAIT_n"""
+
+    def on_retry(self, metrics, error):
+        """Called when a request is sent again after `error`"""
+
+
+class Histogram(object):
+    """ Log-bucketed histogram, relative error about growth / 2
+
+    :param growth: Ratio between bucket bounds
+    :param minimum: Values below it share the first bucket
+    """
+
+    __slots__ = ('growth', 'minimum', 'count', 'sum', 'max', '_buckets',
+                 '_log_growth')
+
+    def __init__(self, growth=1.05, minimum=1e-6):
+        self.growth = growth
+        self.minimum = minimum
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+        self._buckets = {}
+        self._log_growth = math.log(growth)
+
+    def add(self, value):
+        index = 0
+
+        if value > self.minimum:
+            index = int(math.log(value / self.minimum) / self._log_growth) + 1
+
+        self._buckets[index] = self._buckets.get(index, 0) + 1
+        self.count += 1
+        self.sum += value
+
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q):
+        """Approximate value below which `q` percent of values fall"""
+        if not self.count:
+            return 0.0
+
+        rank = q / 100 * self.count
+        seen = 0
+
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+
+            if seen >= rank:
+                if index == 0:
+                    return self.minimum
+
+                upper = self.minimum * self.growth ** index
+                return min(upper / math.sqrt(self.growth), self.max)
+
+        return self.max
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'mean': self.sum / self.count if self.count else 0.0,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'max': self.max,
+        }
+
+
+PHASES = ('total', 'parse', 'serialize', 'network', 'render')
+
+
+class MetricsCollector(Observer):
+    """ In-memory metrics per method: latency histograms of every phase,
+        byte counters, errors, flood waits and retries.
+
+        graph = TgGraph(token, observers=[collector])
+        ...
+        collector.snapshot()['createPage']['network']['p99']
+    """
+
+    def __init__(self, growth=1.05):
+        self.growth = growth
+
+        self._lock = threading.Lock()
+        self._methods = {}
+
+    def _entry(self, method):
+        entry = self._methods.get(method)
+
+        if entry is None:
+            entry = self._methods[method] = {
+                'histograms': {phase: Histogram(self.growth) for phase in PHASES},
+                'calls': 0,
+                'errors': 0,
+                'flood_waits': 0,
+                'retries': 0,
+                'coalesced': 0,
+                'request_bytes': 0,
+                'response_bytes': 0,
+            }
+
+        return entry
+
+    def on_call(self, metrics):
+        with self._lock:
+            entry = self._entry(metrics.method)
+            entry['calls'] += 1
+            entry['errors'] += metrics.error is not None
+            entry['flood_waits'] += metrics.flood_waits
+            entry['retries'] += metrics.retries
+            entry['coalesced'] += metrics.coalesced
+            entry['request_bytes'] += metrics.request_bytes
+            entry['response_bytes'] += metrics.response_bytes
+
+            for phase, histogram in entry['histograms'].items():
+                value = getattr(metrics, phase)
+
+                if value or phase == 'total':
+                    histogram.add(value)
+
+    def snapshot(self):
+        """ {method: {'calls', 'errors', ..., phase: {'p50', 'p99', ...}}} """
+        with self._lock:
+            result = {}
+
+            for method, entry in self._methods.items():
+                stats = {k: v for k, v in entry.items() if k != 'histograms'}
+
+                for phase, histogram in entry['histograms'].items():
+                    stats[phase] = histogram.snapshot()
+
+                result[method] = stats
+
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._methods.clear()
+
+
+@contextlib.contextmanager
+def timed(metrics, phase):
+    """ Add the time spent in the block to `phase` of `metrics` (if any) """
+    if metrics is None:
+        yield
+        return
+
+    start = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        setattr(metrics, phase, getattr(metrics, phase) + time.perf_counter() - start)
@@ -0,0 +1,188 @@
+import sqlite3
+import time
+
+from .serializers import get_serializer
+from .TgGraph import BLOCK_ELEMENTS, json_dumps, nodes_to_html
+
+PAGE_FIELDS = ('path', 'url', 'title', 'description', 'author_name',
+               'author_url', 'image_url', 'views')
+
+
+def nodes_text(nodes):
+    """ Plain text of a nodes list, block elements on their own lines """
+    parts = []
+    stack = [iter(nodes)]
+
+    while stack:
+        node = next(stack[-1], None)
+
+        if node is None:
+            stack.pop()
+        elif isinstance(node, str):
+            parts.append(node)
+        else:
+            if node['tag'] in BLOCK_ELEMENTS:
+                parts.append('\n')
+
+            if node.get('children'):
+                stack.append(iter(node['children']))
+
+    return ''.join(parts).strip()
+
+
+class PageMirror(object):
+    """ Local copy of the pages of one Telegraph account in SQLite, with
+        a full-text index over titles and content.
+
+        Filled by TgGraph.sync_mirror; a TgGraph created with
+        mirror=PageMirror(...) marks the pages it edits as stale so the
+        next sync fetches their content again
+
+    :param filename: Database file (':memory:' for a per-process mirror)
+    """
+
+    __slots__ = ('connection', 'fts')
+
+    def __init__(self, filename=':memory:'):
+        self.connection = sqlite3.connect(filename)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS pages ('
+            ' path TEXT PRIMARY KEY, url TEXT, title TEXT, description TEXT,'
+            ' author_name TEXT, author_url TEXT, image_url TEXT,'
+            ' views INTEGER, content TEXT, number INTEGER,'
+            ' stale INTEGER NOT NULL DEFAULT 0, synced REAL NOT NULL)'
+        )
+
+        try:
+            self.connection.execute(
+                'CREATE VIRTUAL TABLE IF NOT EXISTS pages_fts USING fts5('
+                ' path UNINDEXED, title, text)'
+            )
+            self.fts = True
+        except sqlite3.OperationalError:  # SQLite built without FTS5
+            self.fts = False
+
+        self.connection.commit()
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM pages').fetchone()[0]
+
+    def __contains__(self, path):
+        return self.connection.execute(
+            'SELECT 1 FROM pages WHERE path = ?', (path,)
+        ).fetchone() is not None
+
+    def put_many(self, pages, numbers=None):
+        """ Store pages as returned by get_page (with nodes content)
+
+        :param pages: Page dicts
+        :param numbers: Position of every page in creation order (0 is
+                        the first page of the account), kept if None
+        """
+        now = time.time()
+
+        if numbers is None:
+            numbers = [None] * len(pages)
+
+        with self.connection:
+            for page, number in zip(pages, numbers):
+                content = page.get('content')
+
+                self.connection.execute(
+                    'INSERT INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0, ?)'
+                    ' ON CONFLICT (path) DO UPDATE SET url = excluded.url,'
+                    ' title = excluded.title, description = excluded.description,'
+                    ' author_name = excluded.author_name,'
+                    ' author_url = excluded.author_url,'
+                    ' image_url = excluded.image_url, views = excluded.views,'
+                    ' content = excluded.content,'
+                    ' number = coalesce(excluded.number, number),'
+                    ' stale = 0, synced = excluded.synced',
+                    tuple(page.get(field) for field in PAGE_FIELDS)
+                    + (None if content is None else json_dumps(content),
+                       number, now)
+                )
+
+                if self.fts:
+                    self.connection.execute(
+                        'DELETE FROM pages_fts WHERE path = ?', (page['path'],)
+                    )
+                    self.connection.execute(
+                        'INSERT INTO pages_fts VALUES (?, ?, ?)',
+                        (page['path'], page.get('title') or '',
+                         nodes_text(content or []))
+                    )
+
+    def mark_stale(self, path):
+        """Content of `path` changed, fetch it again on the next sync"""
+        with self.connection:
+            self.connection.execute(
+                'UPDATE pages SET stale = 1 WHERE path = ?', (path,)
+            )
+
+    def stale_paths(self):
+        return [row[0] for row in self.connection.execute(
+            'SELECT path FROM pages WHERE stale = 1 OR content IS NULL'
+        )]
+
+    def get_page(self, path, return_html=False):
+        """ Page dict like get_page returns it, None if it's not mirrored
+
+        :param return_html: Content as HTML instead of Nodes list
+        """
+        row = self.connection.execute(
+            'SELECT {}, content FROM pages WHERE path = ?'.format(
+                ', '.join(PAGE_FIELDS)
+            ), (path,)
+        ).fetchone()
+
+        if row is None:
+            return None
+
+        page = dict(zip(PAGE_FIELDS, row))
+
+        if row[-1] is not None:
+            page['content'] = get_serializer().loads(row[-1])
+
+            if return_html:
+                page['content'] = nodes_to_html(page['content'])
+
+        return page
+
+    def get_html(self, path):
+        page = self.get_page(path, return_html=True)
+        return None if page is None else page.get('content')
+
+    def list_pages(self, offset=0, limit=50):
+        """Mirrored pages without content, most recently created first"""
+        return [dict(zip(PAGE_FIELDS, row)) for row in self.connection.execute(
+            'SELECT {} FROM pages ORDER BY number DESC'
+            ' LIMIT ? OFFSET ?'.format(', '.join(PAGE_FIELDS)),
+            (limit, offset)
+        )]
+
+    def search(self, query, limit=20):
+        """ Pages whose title or content match `query`, best match first.
+            Returns dicts with path, title and a snippet of the match.
+            With FTS5 `query` uses its syntax (words, "phrases", OR,
+            prefix*), without it pages containing `query` are returned
+        """
+        if self.fts:
+            rows = self.connection.execute(
+                "SELECT path, title, snippet(pages_fts, 2, '[', ']', '…', 12)"
+                ' FROM pages_fts WHERE pages_fts MATCH ? ORDER BY rank LIMIT ?',
+                (query, limit)
+            )
+        else:
+            pattern = '%{}%'.format(query)
+            rows = self.connection.execute(
+                'SELECT path, title, substr(content, 1, 200) FROM pages'
+                ' WHERE title LIKE ? OR content LIKE ? LIMIT ?',
+                (pattern, pattern, limit)
+            )
+
+        return [{'path': path, 'title': title, 'snippet': snippet}
+                for path, title, snippet in rows]
+
+    def close(self):
+        self.connection.close()
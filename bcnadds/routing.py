@@ -0,0 +1,158 @@
+import time
+from collections import deque
+
+
+class DomainStats(object):
+    """ Rolling health of one domain """
+
+    __slots__ = ('domain', 'latency', 'outcomes', 'failures', 'open_until',
+                 'probing', 'last_used')
+
+    def __init__(self, domain, window):
+        self.domain = domain
+        self.latency = None  # exponentially weighted average, seconds
+        self.outcomes = deque(maxlen=window)
+        self.failures = 0  # consecutive
+        self.open_until = 0.0
+        self.probing = False
+        self.last_used = 0.0
+
+    @property
+    def error_rate(self):
+        if not self.outcomes:
+            return 0.0
+
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def score(self, error_penalty):
+        return (self.latency or 0.0) * (1 + error_penalty * self.error_rate)
+
+
+class DomainRouter(object):
+    """ Latency based routing between Telegraph domains with a circuit
+        breaker per domain
+
+    Calls go to the domain with the lowest average latency weighted by its
+    recent error rate, failures count as `failure_latency` seconds. After
+    `failure_threshold` consecutive failures a domain is taken out of
+    rotation for `cooldown` seconds, then a single call is let through as
+    a probe: success puts it back, failure opens the circuit again.
+    Domains that lost on score get a call every `probe_interval` seconds
+    so that a recovered domain is noticed.
+
+    :param domains: Domains, e.g. ['telegra.ph', 'graph.org']
+    :param window: Number of recent calls the error rate is computed over
+    :param failure_threshold: Consecutive failures opening the circuit
+    :param cooldown: Seconds a failing domain stays out of rotation
+    :param alpha: Weight of the newest sample in the latency average
+    :param error_penalty: How much the error rate inflates the latency score
+    :param failure_latency: Latency sample recorded for a failed call
+    :param probe_interval: Seconds after which an unused domain is retried
+    """
+
+    __slots__ = ('stats', 'failure_threshold', 'cooldown', 'alpha',
+                 'error_penalty', 'failure_latency', 'probe_interval')
+
+    def __init__(self, domains, window=20, failure_threshold=3, cooldown=30,
+                 alpha=0.3, error_penalty=4, failure_latency=5.0,
+                 probe_interval=60):
+        if isinstance(domains, str):
+            domains = [domains]
+
+        if not domains:
+            raise ValueError('at least one domain is required')
+
+        self.stats = {domain: DomainStats(domain, window) for domain in domains}
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.alpha = alpha
+        self.error_penalty = error_penalty
+        self.failure_latency = failure_latency
+        self.probe_interval = probe_interval
+
+    @property
+    def domains(self):
+        return list(self.stats)
+
+    def choose(self, exclude=()):
+        """ Pick the healthiest domain not in `exclude` """
+        now = time.monotonic()
+        candidates = []
+        fallback = []
+
+        for stats in self.stats.values():
+            if stats.domain in exclude:
+                continue
+
+            fallback.append(stats)
+
+            if stats.open_until > now or (stats.open_until and stats.probing):
+                continue  # open, or half-open with a probe in flight
+
+            candidates.append(stats)
+
+        if not candidates:
+            if not fallback:
+                raise ValueError('no domain left to try')
+
+            # every circuit is open, try the one closest to its probe
+            return min(fallback, key=lambda s: s.open_until).domain
+
+        stale = [
+            s for s in candidates
+            if s.latency is not None and now - s.last_used >= self.probe_interval
+        ]
+
+        if stale:
+            best = stale[0]
+        else:
+            best = min(candidates, key=lambda s: s.score(self.error_penalty))
+
+        if best.open_until:
+            best.probing = True
+
+        best.last_used = now
+        return best.domain
+
+    def record(self, domain, latency, ok):
+        """ Report the outcome of a call sent to `domain` """
+        stats = self.stats[domain]
+
+        if not ok:
+            latency = max(latency, self.failure_latency)
+
+        if stats.latency is None:
+            stats.latency = latency
+        else:
+            stats.latency += self.alpha * (latency - stats.latency)
+
+        stats.outcomes.append(ok)
+        stats.probing = False
+
+        if ok:
+            stats.failures = 0
+            stats.open_until = 0.0
+        else:
+            stats.failures += 1
+
+            if stats.failures >= self.failure_threshold:
+                stats.open_until = time.monotonic() + self.cooldown
+
+    def release(self, domain):
+        """ A call sent to `domain` ended, with or without an outcome
+            (e.g. cancelled): don't hold back the next probe
+        """
+        self.stats[domain].probing = False
+
+    def snapshot(self):
+        """ Current health of every domain """
+        now = time.monotonic()
+
+        return {
+            stats.domain: {
+                'latency': stats.latency,
+                'error_rate': stats.error_rate,
+                'available': stats.open_until <= now,
+            }
+            for stats in self.stats.values()
+        }
@@ -0,0 +1,258 @@
+import asyncio
+import heapq
+import itertools
+import time
+
+from .errors import RetryAfterError
+
+
+class TokenBucket:
+    """ Token bucket rate limiter
+
+    :param rate: Tokens added per second
+    :param capacity: Maximum burst size (default = rate)
+    """
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def delay(self, now):
+        """Seconds until a token is available, without taking it"""
+        tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+
+        if tokens >= 1:
+            return 0.0
+
+        return (1 - tokens) / self.rate
+
+    def reserve(self, now=None):
+        """ Take one token and return how many seconds the caller
+            has to wait before using it
+        """
+        if now is None:
+            now = time.monotonic()
+
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+
+        if self.tokens >= 0:
+            return 0.0
+
+        return -self.tokens / self.rate
+
+
+class RequestScheduler:
+    """ Flood-wait aware request scheduler for TgGraphApi
+
+    Requests are rate limited per access token and per domain, dispatched
+    in priority order (lower value goes first) with at most `max_in_flight`
+    requests running at once, and retried after the server-given
+    `retry_after` when the API answers FLOOD_WAIT_n. Rate limit tokens are
+    handed out in priority order too: a request waiting for a bucket is
+    overtaken by a later one with a lower priority value.
+
+    :param max_in_flight: Maximum number of concurrent requests
+    :param token_rate: Requests per second allowed for one access token
+                       (None disables the limit)
+    :param token_burst: Burst size for one access token
+    :param domain_rate: Requests per second allowed for one domain
+                        (None disables the limit)
+    :param domain_burst: Burst size for one domain
+    :param max_retries: How many times a flood-waited request is retried
+    :param max_retry_after: Flood waits longer than this many seconds are
+                            raised instead of waited out (None = no cap)
+    """
+
+    __slots__ = (
+        'max_in_flight', 'token_rate', 'token_burst', 'domain_rate',
+        'domain_burst', 'max_retries', 'max_retry_after', 'in_flight',
+        '_waiters', '_counter', '_token_buckets', '_domain_buckets',
+        '_blocked_until', '_pump', '_wakeup'
+    )
+
+    def __init__(self, max_in_flight=4, token_rate=None, token_burst=None,
+                 domain_rate=None, domain_burst=None, max_retries=3,
+                 max_retry_after=None):
+        if max_in_flight < 1:
+            raise ValueError('max_in_flight must be at least 1')
+
+        self.max_in_flight = max_in_flight
+        self.token_rate = token_rate
+        self.token_burst = token_burst
+        self.domain_rate = domain_rate
+        self.domain_burst = domain_burst
+        self.max_retries = max_retries
+        self.max_retry_after = max_retry_after
+
+        self.in_flight = 0
+
+        self._waiters = []
+        self._counter = itertools.count()
+        self._token_buckets = {}
+        self._domain_buckets = {}
+        self._blocked_until = {}
+        self._pump = None
+        self._wakeup = None
+
+    def _bucket(self, buckets, key, rate, burst):
+        bucket = buckets.get(key)
+
+        if bucket is None:
+            bucket = buckets[key] = TokenBucket(rate, burst)
+
+        return bucket
+
+    def _buckets_for(self, token, domain):
+        buckets = []
+
+        if self.token_rate is not None:
+            buckets.append(self._bucket(
+                self._token_buckets, token, self.token_rate, self.token_burst
+            ))
+
+        if self.domain_rate is not None:
+            buckets.append(self._bucket(
+                self._domain_buckets, domain, self.domain_rate, self.domain_burst
+            ))
+
+        return buckets
+
+    def _delay(self, token, domain, now):
+        """Seconds until a request may start, without taking anything"""
+        delay = self._blocked_until.get(token, 0.0) - now
+
+        for bucket in self._buckets_for(token, domain):
+            delay = max(delay, bucket.delay(now))
+
+        return delay
+
+    def _start(self, token, domain, now):
+        for bucket in self._buckets_for(token, domain):
+            bucket.reserve(now)
+
+        self.in_flight += 1
+
+    async def _acquire(self, priority, token, domain):
+        now = time.monotonic()
+
+        if (self.in_flight < self.max_in_flight and not self._waiters
+                and self._delay(token, domain, now) <= 0):
+            self._start(token, domain, now)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(
+            self._waiters, (priority, next(self._counter), token, domain, future)
+        )
+        self._wake()
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release()  # the slot was granted right before cancel
+            raise
+
+    def _release(self):
+        self.in_flight -= 1
+
+        if self._waiters:
+            self._wake()
+
+    def _wake(self):
+        """Run the dispatcher, starting it if it isn't running"""
+        if self._pump is None or self._pump.done():
+            self._wakeup = asyncio.Event()
+            self._pump = asyncio.get_running_loop().create_task(self._dispatch())
+        else:
+            self._wakeup.set()
+
+    async def _dispatch(self):
+        """ Start waiters in priority order while there are free slots
+            and their buckets have tokens, sleep until the next one can
+            go or something changes
+        """
+        while self._waiters:
+            self._wakeup.clear()
+            timeout = self._dispatch_ready()
+
+            if not self._waiters:
+                return
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _dispatch_ready(self):
+        """ Start every waiter that can go now, return the seconds until
+            a rate limited one can (None if they only wait for slots)
+        """
+        now = time.monotonic()
+        timeout = None
+        waiting = []
+
+        for entry in sorted(self._waiters):
+            token, domain, future = entry[2:]
+
+            if future.done():  # cancelled
+                continue
+
+            if self.in_flight >= self.max_in_flight:
+                waiting.append(entry)
+                continue
+
+            delay = self._delay(token, domain, now)
+
+            if delay > 0:
+                # later waiters sharing its buckets wait as well, since
+                # nothing is taken from them here
+                waiting.append(entry)
+                timeout = delay if timeout is None else min(timeout, delay)
+                continue
+
+            self._start(token, domain, now)
+            future.set_result(None)
+
+        self._waiters = waiting  # sorted, so still a heap
+        return timeout
+
+    def block(self, seconds, token=None):
+        """ Hold every request made with `token` for `seconds` """
+        until = time.monotonic() + seconds
+
+        if until > self._blocked_until.get(token, 0.0):
+            self._blocked_until[token] = until
+
+    async def submit(self, func, token=None, domain=None, priority=0):
+        """ Run `func` (a coroutine function without arguments)
+            under the scheduler's limits
+
+        :param func: Coroutine function performing the request
+        :param token: Access token the request is made with
+        :param domain: Domain the request is sent to
+        :param priority: Lower values are dispatched first
+        """
+        attempt = 0
+
+        while True:
+            await self._acquire(priority, token, domain)
+
+            try:
+                return await func()
+            except RetryAfterError as e:
+                if attempt >= self.max_retries or (
+                        self.max_retry_after is not None
+                        and e.retry_after > self.max_retry_after):
+                    raise
+
+                attempt += 1
+                self.block(e.retry_after, token)
+            finally:
+                self._release()
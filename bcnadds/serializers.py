@@ -0,0 +1,161 @@
+import json
+import math
+
+
+class JsonSerializer(object):
+    """ stdlib json, the reference output every backend must match:
+        compact separators, non-ASCII characters left as they are
+    """
+
+    __slots__ = ()
+
+    name = 'json'
+
+    def dumps(self, obj, default=None):
+        return json.dumps(obj, default=default, separators=(',', ':'),
+                          ensure_ascii=False)
+
+    def dumpb(self, obj, default=None):
+        """Encode to UTF-8 bytes"""
+        return self.dumps(obj, default).encode('utf-8')
+
+    def loads(self, data):
+        """Decode str or UTF-8 bytes"""
+        return json.loads(data)
+
+    def __repr__(self):
+        return '<{} {}>'.format(type(self).__name__, self.name)
+
+
+def has_non_finite(obj):
+    """ Whether `obj` holds a NaN or infinite float anywhere """
+    stack = [obj]
+
+    while stack:
+        obj = stack.pop()
+
+        if isinstance(obj, float):
+            if not math.isfinite(obj):
+                return True
+        elif isinstance(obj, dict):
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple)):
+            stack.extend(obj)
+
+    return False
+
+
+class OrjsonSerializer(JsonSerializer):
+    """ orjson, falls back to stdlib for what it refuses to encode
+        (non-str dict keys, integers above 64 bits, deep nesting) and
+        for NaN and infinities, which orjson encodes as null. Only
+        output containing null is searched for those.
+        Floats in exponent notation differ (1e16, stdlib 1e+16),
+        Telegraph payloads have none
+    """
+
+    __slots__ = ('_orjson',)
+
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+
+    def dumps(self, obj, default=None):
+        return self.dumpb(obj, default).decode('utf-8')
+
+    def dumpb(self, obj, default=None):
+        try:
+            data = self._orjson.dumps(obj, default=default)
+        except TypeError:
+            data = None
+
+        if data is None or (b'null' in data and has_non_finite(obj)):
+            return JsonSerializer.dumps(self, obj, default).encode('utf-8')
+
+        return data
+
+    def loads(self, data):
+        try:
+            return self._orjson.loads(data)
+        except ValueError:
+            return json.loads(data)  # NaN, integers above 64 bits
+
+
+class UjsonSerializer(JsonSerializer):
+    """ ujson, falls back to stdlib where it fails.
+        Floats in exponent notation may differ (1e-7, stdlib 1e-07)
+    """
+
+    __slots__ = ('_ujson',)
+
+    name = 'ujson'
+
+    def __init__(self):
+        import ujson
+        self._ujson = ujson
+
+    def dumps(self, obj, default=None):
+        try:
+            return self._ujson.dumps(obj, ensure_ascii=False,
+                                     escape_forward_slashes=False,
+                                     default=default)
+        except (TypeError, ValueError, OverflowError):
+            return JsonSerializer.dumps(self, obj, default)
+
+    def loads(self, data):
+        try:
+            return self._ujson.loads(data)
+        except ValueError:
+            return json.loads(data)
+
+
+SERIALIZERS = {
+    'orjson': OrjsonSerializer,
+    'ujson': UjsonSerializer,
+    'json': JsonSerializer,
+}
+
+_serializer = None
+
+
+def load_serializer(name=None):
+    """ Instantiate serializer `name` (see SERIALIZERS), by default the
+        fastest one installed
+    """
+    if name is not None:
+        return SERIALIZERS[name]()
+
+    for cls in SERIALIZERS.values():
+        try:
+            return cls()
+        except ImportError:
+            continue
+
+
+def get_serializer():
+    """ Serializer used by json_dumps and for API requests and responses """
+    global _serializer
+
+    if _serializer is None:
+        _serializer = load_serializer()
+
+    return _serializer
+
+
+def set_serializer(serializer):
+    """ Switch the JSON backend of the whole package
+
+    :param serializer: Name from SERIALIZERS, None to autodetect, or an
+                       object with dumps, dumpb and loads methods like
+                       JsonSerializer. Output must be identical to
+                       JsonSerializer's, it's hashed and size-checked
+    """
+    global _serializer
+
+    if serializer is None or isinstance(serializer, str):
+        serializer = load_serializer(serializer)
+
+    _serializer = serializer
+    return serializer
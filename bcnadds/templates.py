@@ -0,0 +1,221 @@
+import re
+
+from .errors import NotAllowedTag
+from .TgGraph import ALLOWED_TAGS, Node, html_to_nodes
+
+RE_SLOT = re.compile(r'\{\{\s*([A-Za-z_]\w*)\s*\}\}')
+
+
+class Slot(object):
+    """Place in a template filled with a value at fill time"""
+
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return 'Slot({!r})'.format(self.name)
+
+
+class _Element(object):
+    """ Element of a template with slots somewhere inside, rebuilt on
+        every fill. `attrs` maps attribute names to values or lists of
+        text and Slot parts, `children` is the compiled children list;
+        None when only the other one has slots
+    """
+
+    __slots__ = ('node', 'attrs', 'children')
+
+    def __init__(self, node, attrs, children):
+        self.node = node
+        self.attrs = attrs
+        self.children = children
+
+
+def _compile_text(s, slots):
+    """List of text and Slot parts of `s`, None without slots"""
+    pieces = RE_SLOT.split(s)
+
+    if len(pieces) == 1:
+        return None
+
+    parts = []
+
+    for i, piece in enumerate(pieces):
+        if i % 2:
+            slots.add(piece)
+            parts.append(Slot(piece))
+        elif piece:
+            parts.append(piece)
+
+    return parts
+
+
+def _compile(nodes, slots):
+    """ Compiled nodes list and whether it has slots. Nodes without
+        slots are kept as they are, to be shared by every fill
+    """
+    compiled = []
+    dynamic = False
+
+    for node in nodes:
+        if isinstance(node, str):
+            parts = _compile_text(node, slots)
+
+            if parts is None:
+                compiled.append(node)
+            else:
+                compiled.extend(parts)
+                dynamic = True
+
+            continue
+
+        if node['tag'] not in ALLOWED_TAGS:
+            raise NotAllowedTag(f'{node["tag"]!r} tag is not allowed')
+
+        attrs = None
+        children = None
+
+        for attr, value in (node.get('attrs') or {}).items():
+            parts = _compile_text(value, slots) if value else None
+
+            if parts is not None:
+                if attrs is None:
+                    attrs = dict(node['attrs'])
+
+                attrs[attr] = parts
+
+        if node.get('children'):
+            children, has_slots = _compile(node['children'], slots)
+
+            if not has_slots:
+                children = None
+
+        if attrs is None and children is None:
+            compiled.append(node)
+        else:
+            compiled.append(_Element(node, attrs, children))
+            dynamic = True
+
+    return compiled, dynamic
+
+
+def _append_text(nodes, s):
+    if not s:
+        return
+
+    if nodes and isinstance(nodes[-1], str):
+        nodes[-1] += s
+    else:
+        nodes.append(s)
+
+
+def _fill_text(parts, values):
+    if isinstance(parts, str):
+        return parts
+
+    result = []
+
+    for part in parts:
+        if isinstance(part, Slot):
+            value = values[part.name]
+
+            if isinstance(value, (list, tuple, dict, Node)):
+                raise TypeError(f'attribute slot {part.name!r} takes text')
+
+            part = str(value)
+
+        result.append(part)
+
+    return ''.join(result)
+
+
+def _fill(compiled, values):
+    result = []
+
+    for item in compiled:
+        if isinstance(item, str):
+            _append_text(result, item)
+        elif isinstance(item, Slot):
+            value = values[item.name]
+
+            if isinstance(value, (list, tuple)):
+                for node in value:
+                    if isinstance(node, str):
+                        _append_text(result, node)
+                    else:
+                        result.append(node)
+            elif isinstance(value, (dict, Node)):
+                result.append(value)
+            else:
+                _append_text(result, str(value))
+        elif isinstance(item, _Element):
+            node = item.node
+
+            attrs = node.get('attrs')
+            if item.attrs is not None:
+                attrs = {k: _fill_text(v, values) for k, v in item.attrs.items()}
+
+            children = node.get('children')
+            if item.children is not None:
+                children = _fill(item.children, values) or None
+
+            if isinstance(node, Node):
+                result.append(Node(node.tag, attrs, children))
+            else:
+                node = {'tag': node['tag']}
+
+                if attrs is not None:
+                    node['attrs'] = attrs
+
+                if children is not None:
+                    node['children'] = children
+
+                result.append(node)
+        else:
+            result.append(item)
+
+    return result
+
+
+class Template(object):
+    """ Page layout parsed once and filled with different values.
+
+        Slots are written {{ name }} in text or attribute values. Text
+        values are inserted as text (never parsed as HTML), text slots
+        also take a node list or a single node. Filled node lists share
+        every node without slots with the template and each other, so
+        treat them as read-only
+
+            template = Template('<h3>{{ title }}</h3><p>By '
+                                '<a href="{{ url }}">{{ author }}</a></p>'
+                                '{{ body }}')
+            content = template.fill(title='<Hi>', url=url, author='me',
+                                    body=html_to_nodes(html_content))
+            await graph.create_page('Hi', content=content)
+
+    :param html_content: Template in HTML format
+    :param nodes: Template in nodes list format, instead of html_content
+    :param engine: html_to_nodes engine used to parse html_content
+    :param compact: Parse html_content into Node objects instead of dicts
+    """
+
+    __slots__ = ('nodes', 'slots', '_compiled')
+
+    def __init__(self, html_content=None, nodes=None, engine=None,
+                 compact=False):
+        if nodes is None:
+            nodes = html_to_nodes(html_content, engine, compact)
+
+        self.nodes = nodes
+        self.slots = set()
+
+        self._compiled, _ = _compile(nodes, self.slots)
+
+    def fill(self, **values):
+        """ Nodes list with every slot filled, missing values raise KeyError """
+        return _fill(self._compiled, values)
+
+    def __repr__(self):
+        return '<Template slots={}>'.format(sorted(self.slots))
@@ -0,0 +1,82 @@
+import asyncio
+
+
+async def aiter_items(iterable):
+    """ Iterate over a sync or async iterable asynchronously """
+    if hasattr(iterable, '__aiter__'):
+        async for item in iterable:
+            yield item
+    else:
+        for item in iterable:
+            yield item
+
+
+async def imap_unordered(func, iterable, concurrency):
+    """ Run coroutine function `func` over the items of a sync or async
+        iterable with at most `concurrency` calls running at once.
+        Yields (index, item, result, error) tuples as calls finish,
+        `error` is the exception raised by the call or None.
+    """
+    if concurrency < 1:
+        raise ValueError('concurrency must be at least 1')
+
+    items = aiter_items(iterable).__aiter__()
+    pending = {}
+    index = 0
+    exhausted = False
+
+    try:
+        while True:
+            while not exhausted and len(pending) < concurrency:
+                try:
+                    item = await items.__anext__()
+                except StopAsyncIteration:
+                    exhausted = True
+                    break
+
+                pending[asyncio.ensure_future(func(item))] = (index, item)
+                index += 1
+
+            if not pending:
+                return
+
+            done, _ = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+
+            for task in done:
+                i, item = pending.pop(task)
+                error = task.exception()
+
+                yield i, item, None if error else task.result(), error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+class SingleFlight(object):
+    """ Coalesces concurrent calls with the same key into one: the first
+        caller starts the call, the others wait for its result
+    """
+
+    __slots__ = ('_calls',)
+
+    def __init__(self):
+        self._calls = {}
+
+    def __len__(self):
+        return len(self._calls)
+
+    async def do(self, key, func):
+        """ Await coroutine function `func` unless a call with `key`
+            is already in flight, then share its result or exception
+        """
+        future = self._calls.get(key)
+
+        if future is None:
+            future = asyncio.ensure_future(func())
+            self._calls[key] = future
+            future.add_done_callback(lambda _: self._calls.pop(key, None))
+
+        # a cancelled waiter must not cancel the call the others wait for
+        return await asyncio.shield(future)
@@ -0,0 +1,112 @@
+""" Benchmark runner
+
+    python -m benchmarks [--only micro end_to_end ...] [--quick]
+                         [--output results.json] [--compare baseline.json]
+
+Every suite returns records with `suite`, `name`, `unit` and statistics of
+the measured values (`best`, `median`, `mean`, `stdev`, `runs`). --output
+writes them as JSON together with the bcnadds and Python versions, so a
+run on one release can be compared with --compare against another.
+"""
+import argparse
+import datetime
+import importlib
+import json
+import platform
+import sys
+
+import bcnadds
+
+SUITES = ('micro', 'html_parser', 'end_to_end', 'cover')
+
+
+def record_key(record):
+    return record['suite'], record['name'], record.get('document')
+
+
+def compare(records, baseline, threshold):
+    """ Print the change of every median against the baseline run and
+        return the number of regressions worse than `threshold` (0.1 = 10%)
+    """
+    previous = {record_key(r): r for r in baseline['results']}
+    regressions = 0
+
+    print(f"\ncompared with bcnadds {baseline['bcnadds']}, {baseline['timestamp']}")
+
+    for record in records:
+        old = previous.get(record_key(record))
+
+        if old is None or not old['median']:
+            continue
+
+        ratio = record['median'] / old['median']
+
+        if record.get('higher_is_better'):
+            ratio = 1 / ratio if ratio else float('inf')
+
+        flag = ''
+
+        if ratio > 1 + threshold:
+            flag = '  REGRESSION'
+            regressions += 1
+        elif ratio < 1 - threshold:
+            flag = '  faster'
+
+        print(f'{label(record):55} {ratio:6.2f}x cost{flag}')
+
+    return regressions
+
+
+def label(record):
+    name = f"{record['suite']}.{record['name']}"
+
+    if record.get('document'):
+        name += f"[{record['document']}]"
+
+    return name
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    parser.add_argument('--only', nargs='+', choices=SUITES, default=SUITES)
+    parser.add_argument('--quick', action='store_true',
+                        help='fewer repetitions, for smoke testing')
+    parser.add_argument('--output', help='write results as JSON')
+    parser.add_argument('--compare', help='JSON results of a previous run')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='relative slowdown reported as a regression')
+    args = parser.parse_args(argv)
+
+    records = []
+
+    for suite in args.only:
+        module = importlib.import_module(f'benchmarks.{suite}')
+
+        for record in module.run(quick=args.quick):
+            print(f"{label(record):55} {record['median']:12.6g} {record['unit']}")
+            records.append(record)
+
+    report = {
+        'bcnadds': bcnadds.__version__,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'quick': args.quick,
+        'results': records,
+    }
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+        if compare(records, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+""" Shared helpers of the benchmark suite """
+import statistics
+import time
+import timeit
+
+
+def result(suite, name, values, unit='s', higher_is_better=False, **extra):
+    """ Machine-readable result record of one benchmark """
+    record = {
+        'suite': suite,
+        'name': name,
+        'unit': unit,
+        'higher_is_better': higher_is_better,
+        'best': max(values) if higher_is_better else min(values),
+        'median': statistics.median(values),
+        'mean': statistics.mean(values),
+        'stdev': statistics.stdev(values) if len(values) > 1 else 0.0,
+        'runs': len(values),
+    }
+    record.update(extra)
+    return record
+
+
+def measure(func, repeat=5, min_time=0.2):
+    """ Seconds per call of `func`, one value per repeat """
+    number = 1
+
+    while True:
+        elapsed = timeit.timeit(func, number=number)
+
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+
+        number *= 2
+
+    values = [elapsed / number]
+    values.extend(
+        timeit.timeit(func, number=number) / number for _ in range(repeat - 1)
+    )
+    return values
+
+
+async def measure_async(func, repeat=3):
+    """ Seconds per run of coroutine function `func` """
+    values = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await func()
+        values.append(time.perf_counter() - start)
+
+    return values
+
+
+def article(paragraphs):
+    return ''.join(
+        f'<p>Paragraph {i} with <b>bold</b>, <a href="https://t.me/{i}">a link</a>'
+        f' &amp; some   text\n spread over lines.</p>'
+        for i in range(paragraphs)
+    )
+
+
+def log(lines):
+    return '<pre>' + ''.join(
+        f'2023-01-01 00:00:{i % 60:02d} INFO  worker[{i}]: job &lt;{i}&gt; done\n'
+        for i in range(lines)
+    ) + '</pre>'
+
+
+DOCUMENTS = {
+    'small': article(10),
+    'medium': article(300) + log(300),
+    'huge': article(5000) + log(20000),
+}
@@ -0,0 +1,374 @@
+""" Stage by stage timing of generate_cover
+
+    python -m benchmarks.cover
+
+The file based pipeline of bcnadds 0.0.27 is timed too (legacy.*) and its
+output is the reference the current output is compared with pixel by
+pixel (max_pixel_diff and mean_pixel_diff of the generate_cover record).
+Smooth, noise and stripes thumbnails (SAMPLES) are compared, the run fails
+if any of them exceeds PIXEL_TOLERANCE, or if a cover rendered with
+background_scale=1 isn't identical to the reference.
+
+Runs in a temporary directory holding the resources generate_cover reads
+(a synthetic overlay and the DejaVu font standing in for font.ttf and
+font2.ttf), the thumbnail is served by a local HTTP server.
+"""
+import asyncio
+import contextlib
+import os
+import random
+import shutil
+import tempfile
+import textwrap
+import time
+from collections import defaultdict
+
+import aiofiles
+import aiohttp
+import numpy
+from aiohttp import web
+from PIL import (
+    Image, ImageChops, ImageDraw, ImageEnhance, ImageFilter, ImageFont, ImageOps
+)
+
+from bcnadds import funcs
+
+from .common import result
+
+RESOURCES = 'Telugucoders/core/resource'
+FONT_PATHS = (
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+    '/usr/share/fonts/TTF/DejaVuSans.ttf',
+    '/Library/Fonts/Arial.ttf',
+    'C:/Windows/Fonts/arial.ttf',
+)
+TITLE = 'A fairly long song title that needs two lines of text on the cover'
+# largest (max, mean) per channel difference of a cover from the legacy
+# one, on every thumbnail of SAMPLES
+PIXEL_TOLERANCE = (16, 1.0)
+
+
+def jpeg_bytes(image):
+    with tempfile.SpooledTemporaryFile() as fp:
+        image.save(fp, 'JPEG', quality=90)
+        fp.seek(0)
+        return fp.read()
+
+
+def thumbnail_bytes(width=1280, height=720, seed=0):
+    """ Noisy JPEG like a video thumbnail, as served by YouTube """
+    rnd = random.Random(seed)
+    image = Image.new('RGB', (width // 8, height // 8))
+    image.putdata([
+        (rnd.randrange(256), rnd.randrange(256), rnd.randrange(256))
+        for _ in range(image.width * image.height)
+    ])
+    return jpeg_bytes(image.resize((width, height), Image.BICUBIC))
+
+
+def noise_bytes(width=1280, height=720, seed=0):
+    """ JPEG of per-pixel noise, the worst case for blurs """
+    rnd = numpy.random.default_rng(seed)
+    return jpeg_bytes(Image.fromarray(
+        rnd.integers(0, 256, (height, width, 3), dtype=numpy.uint8)
+    ))
+
+
+def stripes_bytes(width=1280, height=720, stripe=1):
+    """ JPEG of black and white vertical stripes `stripe` pixels wide """
+    pixels = numpy.zeros((height, width, 3), dtype=numpy.uint8)
+    pixels[:, (numpy.arange(width) // stripe) % 2 == 0] = 255
+    return jpeg_bytes(Image.fromarray(pixels))
+
+
+# thumbnails the output is compared with the legacy output on
+SAMPLES = {
+    'smooth': thumbnail_bytes,
+    'noise': noise_bytes,
+    'stripes': stripes_bytes,
+    'stripes8': lambda: stripes_bytes(stripe=8),
+}
+
+
+def overlay_image():
+    """ Transparent 1280x720 overlay with opaque bars, like amala.png """
+    image = Image.new('RGBA', (1280, 720), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, 1280, 110), fill=(20, 20, 20, 200))
+    draw.rectangle((0, 540, 1280, 720), fill=(20, 20, 20, 200))
+    return image
+
+
+@contextlib.contextmanager
+def workspace():
+    """ chdir into a temporary directory with the cover resources """
+    font = next((path for path in FONT_PATHS if os.path.isfile(path)), None)
+
+    if font is None:
+        raise RuntimeError('no TrueType font found, tried {}'.format(FONT_PATHS))
+
+    cwd = os.getcwd()
+    directory = tempfile.mkdtemp(prefix='bcnadds-cover-')
+
+    try:
+        os.makedirs(os.path.join(directory, RESOURCES))
+        os.makedirs(os.path.join(directory, 'cache'))
+        overlay_image().save(os.path.join(directory, RESOURCES, 'amala.png'))
+
+        for name in ('font.ttf', 'font2.ttf'):
+            shutil.copy(font, os.path.join(directory, RESOURCES, name))
+
+        os.chdir(directory)
+        yield directory
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+@contextlib.asynccontextmanager
+async def thumbnail_server(data):
+    async def handler(request):
+        return web.Response(body=data, content_type='image/jpeg')
+
+    app = web.Application()
+    app.router.add_get('/thumbnail.jpg', handler)
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+
+    try:
+        yield 'http://127.0.0.1:{}/thumbnail.jpg'.format(runner.addresses[0][1])
+    finally:
+        await runner.cleanup()
+
+
+class Stages(object):
+    """ Accumulates wall time per named stage """
+
+    def __init__(self):
+        self.times = defaultdict(list)
+
+    @contextlib.contextmanager
+    def __call__(self, name):
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.times[name].append(time.perf_counter() - start)
+
+    def prefixed(self, prefix):
+        return lambda name: self(prefix + name)
+
+    def add(self, timings, prefix=''):
+        for name, value in timings.items():
+            self.times[prefix + name].append(value)
+
+
+def legacy_change_image_size(max_width, max_height, image):
+    width_ratio = max_width / image.size[0]
+    height_ratio = max_height / image.size[1]
+    return image.resize((int(width_ratio * image.size[0]),
+                         int(height_ratio * image.size[1])))
+
+
+def legacy_add_corners(im):
+    bigsize = (im.size[0] * 3, im.size[1] * 3)
+    mask = Image.new('L', bigsize, 0)
+    ImageDraw.Draw(mask).ellipse((0, 0) + bigsize, fill=255)
+    mask = mask.resize(im.size, Image.ANTIALIAS)
+    mask = ImageChops.darker(mask, im.split()[-1])
+    im.putalpha(mask)
+
+
+async def legacy_cover(stage, url, title, duration, border='white'):
+    """ generate_cover of bcnadds 0.0.27 split into timed stages, with its
+        temp files; the reference output for pixel comparisons
+    """
+    with stage('download'):
+        async with aiohttp.ClientSession() as session:
+            async with session.get(url) as resp:
+                f = await aiofiles.open('cache/thumbx.png', mode='wb')
+                await f.write(await resp.read())
+                await f.close()
+
+    with stage('decode'):
+        image1 = Image.open('cache/thumbx.png')
+        image2 = Image.open(f'{RESOURCES}/amala.png')
+        image1.load()
+        image2.load()
+
+    with stage('resize'):
+        image3 = legacy_change_image_size(1280, 720, image1)
+        image4 = legacy_change_image_size(1280, 720, image2)
+        image5 = image3.convert('RGBA')
+
+    with stage('blur'):
+        background = image5.filter(filter=ImageFilter.BoxBlur(30))
+
+    with stage('brightness'):
+        background = ImageEnhance.Brightness(background).enhance(0.6)
+
+    with stage('save_blur'):
+        background.save('cache/blur_image.png')
+
+    with stage('crop'):
+        x, y = image3.width / 2, image3.height / 2
+        logo = image3.crop((x - 250, y - 250, x + 250, y + 250))
+        logo.thumbnail((520, 520), Image.ANTIALIAS)
+        logo.save('cache/temp.png')
+
+    with stage('circle'):
+        im = Image.open('cache/temp.png').convert('RGBA')
+        legacy_add_corners(im)
+        im.save('cache/circle.png')
+
+    with stage('composite'):
+        image8 = Image.open('cache/circle.png').convert('RGBA')
+        image8.thumbnail((365, 365), Image.ANTIALIAS)
+        background = Image.open('cache/blur_image.png')
+        background.paste(image8, (int((1280 - 365) / 2) + 2, 138), mask=image8)
+        background.paste(image4, (0, 0), mask=image4)
+
+    with stage('border'):
+        img = ImageOps.expand(background, border=10, fill=border)
+
+    with stage('fonts'):
+        font = ImageFont.truetype(f'{RESOURCES}/font2.ttf', 45)
+        ImageFont.truetype(f'{RESOURCES}/font2.ttf', 70)
+        arial = ImageFont.truetype(f'{RESOURCES}/font2.ttf', 30)
+        ImageFont.truetype(f'{RESOURCES}/font.ttf', 30)
+
+    with stage('text'):
+        draw = ImageDraw.Draw(img)
+        draw.text((450, 35), 'STARTED PLAYING', fill='white', stroke_width=1,
+                  stroke_fill='white', font=font)
+
+        for line, top in zip(textwrap.wrap(title, width=32), (560, 610)):
+            text_w, _ = draw.textsize(line, font=font)
+            draw.text(((1280 - text_w) / 2, top), line, fill='white',
+                      stroke_width=1, stroke_fill='white', font=font)
+
+        line = f'Duration: {duration} Mins'
+        text_w, _ = draw.textsize(line, font=arial)
+        draw.text(((1280 - text_w) / 2, 665), line, fill='white', font=arial)
+
+    with stage('save_final'):
+        img.save('final.png')
+
+    for name in ('cache/temp.png', 'cache/circle.png'):
+        os.remove(name)
+
+    return 'final.png'
+
+
+def pixel_difference(a, b):
+    """ (max, mean) absolute difference per channel of two images """
+    a = numpy.asarray(a.convert('RGBA'), dtype=numpy.int16)
+    b = numpy.asarray(b.convert('RGBA'), dtype=numpy.int16)
+
+    if a.shape != b.shape:
+        raise AssertionError(f'size {a.shape} != {b.shape}')
+
+    diff = numpy.abs(a - b)
+    return int(diff.max()), float(diff.mean())
+
+
+async def run_async(quick=False):
+    repeat = 3 if quick else 10
+    stage = Stages()
+    total = []
+    cached = []
+    thumbnail = thumbnail_bytes()
+
+    with workspace():
+        # uncached downloads and renders, comparable with the legacy pipeline
+        fetcher = funcs.configure_thumbnail_fetcher(None)
+        funcs.configure_cover_cache(None, None)
+
+        async with thumbnail_server(thumbnail) as url:
+            for _ in range(repeat):
+                await legacy_cover(stage.prefixed('legacy.'), url, TITLE, '3:45')
+
+            reference = Image.open('final.png')
+            reference.load()
+
+            for _ in range(repeat):
+                with stage('download'):
+                    data = await funcs.download_thumbnail(url)
+
+                timings = {}
+                image = funcs.render_cover(data, TITLE, '3:45', 'white', timings)
+                funcs.save_cover(image, bytes, timings)
+                stage.add(timings)
+
+            for _ in range(repeat):
+                start = time.perf_counter()
+                await funcs.generate_cover('bench', TITLE, 0, '3:45', url)
+                total.append(time.perf_counter() - start)
+
+            await fetcher.close()
+            fetcher = funcs.configure_thumbnail_fetcher('cache/thumbnails')
+
+            for _ in range(repeat):
+                with stage('download.cached'):
+                    await funcs.download_thumbnail(url)
+
+            funcs.configure_cover_cache(directory='cache/covers')
+            await funcs.generate_cover('bench', TITLE, 0, '3:45', url)
+
+            for _ in range(repeat):
+                start = time.perf_counter()
+                await funcs.generate_cover('bench', TITLE, 0, '3:45', url)
+                cached.append(time.perf_counter() - start)
+
+            await fetcher.close()
+            funcs.configure_cover_cache(None, None)
+
+        differences = {'smooth': pixel_difference(reference, image)}
+
+        for sample, make in SAMPLES.items():
+            data = make()
+
+            if sample != 'smooth':
+                async with thumbnail_server(data) as url:
+                    await legacy_cover(Stages(), url, TITLE, '3:45')
+
+                reference = Image.open('final.png')
+                reference.load()
+                image = funcs.render_cover(data, TITLE, '3:45', 'white')
+                differences[sample] = pixel_difference(reference, image)
+
+            exact = funcs.render_cover(data, TITLE, '3:45', 'white',
+                                       background_scale=1)
+
+            if pixel_difference(reference, exact) != (0, 0.0):
+                raise AssertionError(
+                    f'background_scale=1 differs from the legacy cover on {sample}'
+                )
+
+    for sample, (max_diff, mean_diff) in differences.items():
+        if max_diff > PIXEL_TOLERANCE[0] or mean_diff > PIXEL_TOLERANCE[1]:
+            raise AssertionError(f'{sample} cover differs from the legacy cover '
+                                 f'by {max_diff} max, {mean_diff:.3f} mean')
+
+    records = [result('cover', f'stage.{name}', values)
+               for name, values in stage.times.items()]
+    records.append(result(
+        'cover', 'generate_cover', total,
+        max_pixel_diff=max(diff[0] for diff in differences.values()),
+        mean_pixel_diff=max(diff[1] for diff in differences.values()),
+    ))
+    records.append(result('cover', 'generate_cover.cached', cached))
+    return records
+
+
+def run(quick=False):
+    return asyncio.run(run_async(quick))
+
+
+if __name__ == '__main__':
+    from .__main__ import main
+    main(['--only', 'cover'])
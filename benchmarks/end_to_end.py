@@ -0,0 +1,108 @@
+""" End-to-end throughput of TgGraph against a local fake Telegraph server
+
+    python -m benchmarks.end_to_end
+"""
+import asyncio
+import time
+
+from bcnadds.metrics import MetricsCollector
+from bcnadds.scheduler import RequestScheduler
+from bcnadds.TgGraph import TgGraph
+
+from .common import article, result
+from .fake_server import FakeTelegraph
+
+HTML_CONTENT = article(20)
+
+
+def pages(count):
+    return [{'title': f'Page {i}', 'html_content': HTML_CONTENT}
+            for i in range(count)]
+
+
+async def create_sequential(graph, count):
+    for spec in pages(count):
+        await graph.create_page(**spec)
+
+
+async def create_bulk(graph, count, concurrency=16):
+    async for item in graph.create_pages_bulk(pages(count), concurrency):
+        if not item.ok:
+            raise item.error
+
+
+async def get_page_concurrent(graph, count):
+    path = (await graph.create_page('Hot page', html_content=HTML_CONTENT))['path']
+    await asyncio.gather(*(graph.get_page(path) for _ in range(count)))
+
+
+async def get_page_distinct(graph, count, concurrency=16):
+    created = [r.result['path'] async for r in graph.create_pages_bulk(
+        pages(concurrency), concurrency)]
+    await asyncio.gather(*(
+        graph.get_page(created[i % len(created)], return_html=False)
+        for i in range(count)
+    ))
+
+
+# name, scenario, FakeTelegraph arguments, use a RequestScheduler
+SCENARIOS = [
+    ('create_page.sequential', create_sequential, {}, False),
+    ('create_pages_bulk', create_bulk, {}, False),
+    ('create_pages_bulk.latency', create_bulk, {'latency': 0.005}, False),
+    ('create_pages_bulk.flood', create_bulk, {'flood_every': 10}, True),
+    ('get_page.coalesced', get_page_concurrent, {'latency': 0.005}, False),
+    ('get_page.distinct', get_page_distinct, {'latency': 0.005}, False),
+]
+
+
+async def run_scenario(scenario, count, server_kwargs, scheduled):
+    async with FakeTelegraph(**server_kwargs) as server:
+        session = server.session()
+        collector = MetricsCollector()
+        scheduler = RequestScheduler(max_in_flight=16) if scheduled else None
+
+        graph = TgGraph('token', session=session, scheduler=scheduler,
+                        observers=[collector])
+
+        try:
+            start = time.perf_counter()
+            await scenario(graph, count)
+            elapsed = time.perf_counter() - start
+        finally:
+            await session.aclose()
+
+        return elapsed, server, collector.snapshot()
+
+
+async def run_async(quick=False):
+    count = 50 if quick else 300
+    repeat = 1 if quick else 3
+    records = []
+
+    for name, scenario, server_kwargs, scheduled in SCENARIOS:
+        values = []
+
+        for _ in range(repeat):
+            elapsed, server, stats = await run_scenario(
+                scenario, count, server_kwargs, scheduled
+            )
+            values.append(count / elapsed)
+
+        p99 = {method: s['total']['p99'] for method, s in stats.items()}
+        records.append(result(
+            'end_to_end', name, values, unit='ops/s', higher_is_better=True,
+            operations=count, requests=server.requests,
+            flood_waits=server.flood_waits, p99=p99, **server_kwargs
+        ))
+
+    return records
+
+
+def run(quick=False):
+    return asyncio.run(run_async(quick))
+
+
+if __name__ == '__main__':
+    from .__main__ import main
+    main(['--only', 'end_to_end'])
@@ -0,0 +1,217 @@
+""" Local stand-in for the Telegraph API used by the end-to-end benchmarks
+
+    async with FakeTelegraph(latency=0.005, flood_every=50) as server:
+        graph = TgGraph('token', session=server.session())
+        ...
+"""
+import asyncio
+import itertools
+import json
+
+import httpx
+from aiohttp import web
+
+from bcnadds.TgGraph import create_session
+
+
+class LocalTransport(httpx.AsyncBaseTransport):
+    """ Sends every request to the local server, whatever domain it's for """
+
+    def __init__(self, port):
+        self.port = port
+        self._transport = httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request):
+        request.url = request.url.copy_with(
+            scheme='http', host='127.0.0.1', port=self.port
+        )
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+class FakeTelegraph(object):
+    """ In-memory Telegraph API served over HTTP on 127.0.0.1
+
+    :param latency: Seconds every request is delayed by
+    :param flood_every: Answer every n-th request with FLOOD_WAIT_`flood_wait`
+                        (None disables flood waits)
+    :param flood_wait: Seconds the injected flood waits ask to wait
+    """
+
+    def __init__(self, latency=0.0, flood_every=None, flood_wait=0):
+        self.latency = latency
+        self.flood_every = flood_every
+        self.flood_wait = flood_wait
+
+        self.pages = {}
+        self.requests = 0
+        self.flood_waits = 0
+        self.port = None
+
+        self._ids = itertools.count(1)
+        self._runner = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.stop()
+
+    async def start(self):
+        app = web.Application(client_max_size=16 * 1024 * 1024)
+        app.router.add_post('/upload', self.upload)
+        app.router.add_post('/{method}', self.call)
+        app.router.add_post('/{method}/{path:.*}', self.call)
+
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        await site.start()
+
+        self.port = self._runner.addresses[0][1]
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def session(self, **kwargs):
+        """ httpx.AsyncClient routed to this server """
+        return create_session(transport=LocalTransport(self.port), **kwargs)
+
+    async def _delay(self):
+        """ Latency and flood-wait injection, returns an error or None """
+        self.requests += 1
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if self.flood_every and self.requests % self.flood_every == 0:
+            self.flood_waits += 1
+            return 'FLOOD_WAIT_{}'.format(self.flood_wait)
+
+    async def call(self, request):
+        error = await self._delay()
+
+        if error is None:
+            if request.content_type == 'application/json':
+                values = await request.json()
+            else:
+                values = dict(await request.post())
+
+            handler = getattr(self, 'api_' + request.match_info['method'], None)
+
+            if handler is None:
+                error = 'METHOD_NOT_FOUND'
+            else:
+                try:
+                    return web.json_response({
+                        'ok': True,
+                        'result': handler(request.match_info.get('path', ''), values)
+                    })
+                except LookupError as e:
+                    error = e.args[0]
+
+        return web.json_response({'ok': False, 'error': error})
+
+    async def upload(self, request):
+        error = await self._delay()
+
+        if error is not None:
+            return web.json_response({'error': error})
+
+        reader = await request.multipart()
+        result = []
+
+        async for part in reader:
+            await part.read()
+            result.append({'src': '/file/{}.jpg'.format(next(self._ids))})
+
+        return web.json_response(result)
+
+    @staticmethod
+    def _flag(values, name):
+        return values.get(name) in (True, 'true')
+
+    @staticmethod
+    def _content(values):
+        content = values.get('content') or []
+        return json.loads(content) if isinstance(content, str) else content
+
+    def _page(self, page, return_content):
+        result = {k: v for k, v in page.items() if k != 'content'}
+
+        if return_content:
+            result['content'] = page['content']
+
+        return result
+
+    def api_createAccount(self, path, values):
+        return {
+            'short_name': values.get('short_name', ''),
+            'author_name': values.get('author_name', ''),
+            'author_url': values.get('author_url', ''),
+            'access_token': 'token{}'.format(next(self._ids)),
+            'auth_url': 'https://edit.telegra.ph/auth/x',
+        }
+
+    def api_getAccountInfo(self, path, values):
+        return {
+            'short_name': 'bench',
+            'author_name': 'bench',
+            'author_url': '',
+            'page_count': len(self.pages),
+        }
+
+    def api_createPage(self, path, values):
+        path = 'Page-{}'.format(next(self._ids))
+        self.pages[path] = {
+            'path': path,
+            'url': 'https://telegra.ph/' + path,
+            'title': values.get('title', ''),
+            'description': '',
+            'author_name': values.get('author_name', ''),
+            'content': self._content(values),
+            'views': 0,
+            'can_edit': True,
+        }
+        return self._page(self.pages[path], self._flag(values, 'return_content'))
+
+    def api_editPage(self, path, values):
+        if path not in self.pages:
+            raise LookupError('PAGE_NOT_FOUND')
+
+        page = self.pages[path]
+        page['title'] = values.get('title', '')
+        page['content'] = self._content(values)
+
+        return self._page(page, self._flag(values, 'return_content'))
+
+    def api_getPage(self, path, values):
+        if path not in self.pages:
+            raise LookupError('PAGE_NOT_FOUND')
+
+        page = self.pages[path]
+        page['views'] += 1
+
+        return self._page(page, self._flag(values, 'return_content'))
+
+    def api_getPageList(self, path, values):
+        offset = int(values.get('offset') or 0)
+        limit = int(values.get('limit') or 50)
+        pages = list(reversed(self.pages.values()))  # most recent first
+
+        return {
+            'total_count': len(pages),
+            'pages': [self._page(p, False) for p in pages[offset:offset + limit]],
+        }
+
+    def api_getViews(self, path, values):
+        if path not in self.pages:
+            raise LookupError('PAGE_NOT_FOUND')
+
+        return {'views': self.pages[path]['views']}
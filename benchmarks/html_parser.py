@@ -0,0 +1,137 @@
+""" Differential check and benchmark of the html_to_nodes engines
+
+Run from the repository root:
+
+    python -m benchmarks.html_parser
+"""
+import random
+import timeit
+
+from bcnadds.TgGraph import HTML_ENGINES, html_to_nodes
+
+from .common import article, log, measure, result
+
+CORPUS = [
+    '',
+    'plain text',
+    '  leading and   trailing  ',
+    '<p>Hello, <b>world</b>!</p>',
+    '<p>a\n\tb</p><p>  c  </p>',
+    '<pre>  keep\n    this  </pre> and   this not',
+    '<pre><b>a</b>  <br>  b</pre>  c   d',
+    '<pre><pre> x </pre>  y  </pre>  z  ',
+    '<P CLASS="Upper">Case</P>',
+    '<a href="https://t.me/?a=1&amp;b=2" title=\'q "x"\'>link</a>',
+    '<a href=bare>bare</a>',
+    '<img src=a/>',
+    '<a href=x/>t</a>',
+    '<img src="a.png" alt=""><img src="b.png"/>',
+    '<iframe allowfullscreen src="x"></iframe>',
+    '<br><br/><hr /><p/>',
+    '&lt;tag&gt; &amp; &quot;q&quot; &#x41;&#66; &nbsp;x',
+    '&amp;lt; &#39;&#039; &quot &ltx &LT;',
+    'tail &amp',
+    'tail &copy',
+    'x < y > z',
+    '<!-- comment --><p>after</p>',
+    '<!---->',
+    '<!DOCTYPE html><p>x</p>',
+    '<a\nhref="x"\n>multi line</a >',
+    '<span title="x"class="y">no space</span>',
+    '<ul><li>one</li><li>two</li></ul>',
+    '<figure><img src="x"><figcaption>cap</figcaption></figure>',
+    '<blockquote>q</blockquote><aside>a</aside>',
+    '<b>unclosed',
+    '</b>',
+    '<b><i>x</b></i>',
+    '<script>alert(1)</script>',
+    '<p>\xa0nbsp\xa0</p>',
+]
+
+PIECES = [
+    '<p>', '</p>', '<b>', '</b>', '<pre>', '</pre>', '<br>', '<br/>',
+    '<img src="a&amp;b" alt=x>', '<a href=\'q\' data-x>', '</a>', '  text  ',
+    '\n\t', '&amp;', '&lt;b&gt;', '&copy', '<!-- c -->', '<P CLASS="Y">',
+    '</P>', 'x<y', '<hr />', '\xa0', '</a >', '<span title="">', '</span>',
+    '&quot;&#39;', '&amp;lt;', '<a title="&lt;&#39;&quot">', '&ltx',
+    '<img src=a/>', '<a href=x/>',
+]
+
+
+def random_corpus(count, seed=0):
+    rnd = random.Random(seed)
+
+    for _ in range(count):
+        yield ''.join(rnd.choice(PIECES) for _ in range(rnd.randint(0, 12)))
+
+
+def convert(engine, html_content):
+    try:
+        return 'ok', html_to_nodes(html_content, engine)
+    except Exception as e:
+        return type(e).__name__, str(e)
+
+
+def check_parity(documents):
+    checked = 0
+
+    for html_content in documents:
+        expected = convert('stdlib', html_content)
+
+        for engine in HTML_ENGINES:
+            result = convert(engine, html_content)
+
+            if result != expected:
+                raise AssertionError(
+                    f'{engine!r} differs on {html_content!r}: {result!r} != {expected!r}'
+                )
+
+        checked += 1
+
+    return checked
+
+
+DOCUMENTS = {
+    'article-small': article(10),
+    'article-large': article(5000),
+    'log-large': log(20000),
+}
+
+
+def run(quick=False):
+    """ Parity check of all engines, then their speed on DOCUMENTS """
+    checked = check_parity(CORPUS) + check_parity(random_corpus(2000 if quick else 20000))
+    records = []
+
+    for name, html_content in DOCUMENTS.items():
+        for engine in sorted(HTML_ENGINES):
+            records.append(result('html_parser', f'html_to_nodes[{engine}]', measure(
+                lambda: html_to_nodes(html_content, engine),
+                3 if quick else 5, 0.05 if quick else 0.2
+            ), document=name, chars=len(html_content), parity_checked=checked))
+
+    return records
+
+
+def main(repeat=5):
+    checked = check_parity(CORPUS) + check_parity(random_corpus(20000))
+    print(f'parity: {checked} documents identical across {sorted(HTML_ENGINES)}')
+
+    for name, html_content in DOCUMENTS.items():
+        number = max(1, 200000 // len(html_content))
+        timings = {}
+
+        for engine in HTML_ENGINES:
+            timings[engine] = min(timeit.repeat(
+                lambda: html_to_nodes(html_content, engine),
+                number=number, repeat=repeat
+            )) / number
+
+        speedup = timings['stdlib'] / timings['fast']
+        print(f'{name:14} {len(html_content):>9} chars  '
+              + '  '.join(f'{e}={t * 1000:.3f}ms' for e, t in timings.items())
+              + f'  speedup={speedup:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
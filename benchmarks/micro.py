@@ -0,0 +1,58 @@
+""" Microbenchmarks of html_to_nodes, nodes_to_html and json_dumps
+
+    python -m benchmarks.micro
+"""
+from bcnadds import serializers
+from bcnadds.TgGraph import (
+    HTML_ENGINES, html_to_nodes, json_body, json_dumpb, json_dumps, nodes_to_html,
+    split_nodes
+)
+
+from .common import DOCUMENTS, measure, result
+
+
+def run(quick=False):
+    repeat = 3 if quick else 5
+    min_time = 0.05 if quick else 0.2
+    records = []
+
+    for size, html_content in DOCUMENTS.items():
+        nodes = html_to_nodes(html_content)
+        extra = {'document': size, 'chars': len(html_content)}
+
+        for engine in sorted(HTML_ENGINES):
+            records.append(result('micro', f'html_to_nodes[{engine}]', measure(
+                lambda: html_to_nodes(html_content, engine), repeat, min_time
+            ), **extra))
+
+        records.append(result('micro', 'nodes_to_html', measure(
+            lambda: nodes_to_html(nodes), repeat, min_time
+        ), **extra))
+
+        records.append(result('micro', 'json_dumps', measure(
+            lambda: json_dumps(nodes), repeat, min_time
+        ), **extra))
+
+        records.append(result('micro', 'split_nodes', measure(
+            lambda: split_nodes(nodes), repeat, min_time
+        ), **extra))
+
+        for name in serializers.SERIALIZERS:
+            try:
+                serializers.set_serializer(name)
+            except ImportError:
+                continue
+
+            records.append(result('micro', f'json_body[{name}]', measure(
+                lambda: json_body({'title': size, 'content': json_dumpb(nodes)}),
+                repeat, min_time
+            ), **extra))
+
+        serializers.set_serializer(None)
+
+    return records
+
+
+if __name__ == '__main__':
+    from .__main__ import main
+    main(['--only', 'micro'])
@@ -0,0 +1,52 @@
+""" Covers rendered by render_cover against the file based generate_cover
+    of bcnadds 0.0.27, on the thumbnails of the cover benchmark
+
+    python -m pytest -q tests
+"""
+import asyncio
+import os
+
+import pytest
+from PIL import Image
+
+from bcnadds import funcs
+
+from benchmarks.cover import (
+    FONT_PATHS, PIXEL_TOLERANCE, SAMPLES, TITLE, Stages, legacy_cover,
+    pixel_difference, thumbnail_server, workspace
+)
+
+pytestmark = pytest.mark.skipif(
+    not any(os.path.isfile(path) for path in FONT_PATHS),
+    reason='no TrueType font to stand in for the cover fonts'
+)
+
+
+def legacy_reference(data):
+    """ Cover of thumbnail `data` rendered by the legacy pipeline, needs
+        the current directory to be a workspace()
+    """
+    async def render():
+        async with thumbnail_server(data) as url:
+            return await legacy_cover(Stages(), url, TITLE, '3:45')
+
+    image = Image.open(asyncio.run(render()))
+    image.load()
+    return image
+
+
+@pytest.mark.parametrize('sample', sorted(SAMPLES))
+def test_cover_is_within_tolerance_of_legacy_cover(sample):
+    data = SAMPLES[sample]()
+
+    with workspace():
+        reference = legacy_reference(data)
+        image = funcs.render_cover(data, TITLE, '3:45', 'white')
+        exact = funcs.render_cover(data, TITLE, '3:45', 'white',
+                                   background_scale=1)
+
+    max_diff, mean_diff = pixel_difference(reference, image)
+
+    assert max_diff <= PIXEL_TOLERANCE[0]
+    assert mean_diff <= PIXEL_TOLERANCE[1]
+    assert pixel_difference(reference, exact) == (0, 0.0)
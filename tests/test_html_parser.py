@@ -0,0 +1,18 @@
+""" Every html_to_nodes engine gives the same nodes, or the same error,
+    as the stdlib engine
+
+    python -m pytest -q tests
+"""
+import pytest
+
+from benchmarks.html_parser import CORPUS, check_parity, random_corpus
+
+
+@pytest.mark.parametrize('html_content', CORPUS)
+def test_engines_agree_on_corpus(html_content):
+    assert check_parity([html_content]) == 1
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_engines_agree_on_random_documents(seed):
+    assert check_parity(random_corpus(2500, seed)) == 2500
@@ -0,0 +1,54 @@
+""" Partial failures of TgGraph.create_long_page against the local
+    stand-in server of the benchmarks
+
+    python -m pytest -q tests
+"""
+import asyncio
+
+from bcnadds.errors import LongPageError, RetryAfterError
+from bcnadds.TgGraph import TgGraph
+
+from benchmarks.fake_server import FakeTelegraph
+
+
+HTML = ''.join(f'<p>{"paragraph %d " % i * 40}</p>' for i in range(12))
+
+
+async def create_long_page(flood_every):
+    """ (server, LongPageError) of a 3-part create_long_page, requests
+        sent one at a time
+    """
+    async with FakeTelegraph(flood_every=flood_every) as server:
+        session = server.session()
+        graph = TgGraph('token', session=session)
+
+        try:
+            await graph.create_long_page('Title', html_content=HTML,
+                                         max_size=4096, concurrency=1)
+        except LongPageError as e:
+            return server, e
+        finally:
+            await session.aclose()
+
+
+def test_failed_create_reports_created_pages():
+    # requests 1-3 create the parts, the 2nd one is refused
+    server, error = asyncio.run(create_long_page(flood_every=2))
+
+    assert error.step == 'createPage'
+    assert error.results is None
+    assert [page is None for page in error.pages] == [False, True, False]
+    assert len(error.errors) == 1
+    assert isinstance(error.errors[0], RetryAfterError)
+    assert error.__cause__ is error.errors[0]
+
+
+def test_failed_edit_reports_pages_and_filled_parts():
+    # requests 1-3 create the parts, 4-6 fill them in, the 5th is refused
+    server, error = asyncio.run(create_long_page(flood_every=5))
+
+    assert error.step == 'editPage'
+    assert all(page is not None for page in error.pages)
+    assert [result is None for result in error.results] == [False, True, False]
+    assert server.pages[error.pages[1]['path']]['content'] == ['…']
+    assert error.results[0]['path'] == error.pages[0]['path']
@@ -0,0 +1,141 @@
+""" Failover and circuit breaking of DomainRouter, with one stand-in
+    server per API host
+
+    python -m pytest -q tests
+"""
+import asyncio
+
+import httpx
+
+from bcnadds.routing import DomainRouter
+from bcnadds.TgGraph import TgGraphApi
+
+
+DOMAINS = ['telegra.ph', 'graph.org']
+
+
+class Hosts(object):
+    """ httpx.MockTransport handler answering per host: hosts in `down`
+        refuse connections, requests for the `hang` path never finish
+    """
+
+    def __init__(self, down=()):
+        self.down = set(down)
+        self.requests = []
+        self.hang = asyncio.Event()
+
+    async def __call__(self, request):
+        host = request.url.host
+        self.requests.append(host)
+
+        if host in self.down:
+            raise httpx.ConnectError('connection refused', request=request)
+
+        if request.url.path.endswith('/hang'):
+            await self.hang.wait()
+
+        return httpx.Response(200, json={'ok': True, 'result': {'host': host}})
+
+
+def client(hosts, router):
+    session = httpx.AsyncClient(transport=httpx.MockTransport(hosts))
+    return TgGraphApi('token', domain=router, session=session), session
+
+
+def test_connect_error_fails_over_to_the_next_domain():
+    async def run():
+        hosts = Hosts(down={'api.telegra.ph'})
+        router = DomainRouter(DOMAINS)
+        api, session = client(hosts, router)
+
+        try:
+            return hosts, router, await api.method('getAccountInfo')
+        finally:
+            await session.aclose()
+
+    hosts, router, result = asyncio.run(run())
+
+    assert result == {'host': 'api.graph.org'}
+    assert hosts.requests == ['api.telegra.ph', 'api.graph.org']
+    assert router.stats['telegra.ph'].failures == 1
+    assert router.stats['graph.org'].failures == 0
+
+
+def test_circuit_opens_after_failure_threshold_and_probes_after_cooldown():
+    async def run():
+        hosts = Hosts(down={'api.telegra.ph'})
+        # probe_interval=0: telegra.ph is tried whenever its circuit allows
+        router = DomainRouter(DOMAINS, failure_threshold=2, cooldown=0.2,
+                              probe_interval=0)
+        api, session = client(hosts, router)
+        log = {}
+
+        try:
+            for _ in range(3):
+                await api.method('getAccountInfo')
+
+            log['open'] = list(hosts.requests)
+            log['available'] = router.snapshot()['telegra.ph']['available']
+
+            # the probe after the cooldown fails, the circuit opens again
+            await asyncio.sleep(0.25)
+            del hosts.requests[:]
+            await api.method('getAccountInfo')
+            await api.method('getAccountInfo')
+            log['failed_probe'] = list(hosts.requests)
+
+            # the domain is back, the next probe closes the circuit
+            await asyncio.sleep(0.25)
+            hosts.down.clear()
+            del hosts.requests[:]
+            log['probe'] = await api.method('getAccountInfo')
+            log['closed'] = list(hosts.requests)
+        finally:
+            await session.aclose()
+
+        return router, log
+
+    router, log = asyncio.run(run())
+
+    # 2 failures open the circuit, the 3rd call skips telegra.ph
+    assert log['open'] == ['api.telegra.ph', 'api.graph.org',
+                           'api.telegra.ph', 'api.graph.org',
+                           'api.graph.org']
+    assert log['available'] is False
+    assert log['failed_probe'] == ['api.telegra.ph', 'api.graph.org',
+                                   'api.graph.org']
+    assert log['probe'] == {'host': 'api.telegra.ph'}
+    assert log['closed'] == ['api.telegra.ph']
+    assert router.stats['telegra.ph'].failures == 0
+    assert router.snapshot()['telegra.ph']['available'] is True
+
+
+def test_cancelled_probe_releases_the_domain():
+    async def run():
+        hosts = Hosts()
+        router = DomainRouter(DOMAINS, cooldown=0)
+        api, session = client(hosts, router)
+        # graph.org is half-open, telegra.ph stays open
+        router.stats['graph.org'].open_until = 1.0
+        router.stats['telegra.ph'].open_until = float('inf')
+
+        try:
+            task = asyncio.ensure_future(api.method('editPage', path='hang'))
+            await asyncio.sleep(0.05)
+            probing = router.stats['graph.org'].probing
+            task.cancel()
+
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        finally:
+            await session.aclose()
+
+        return hosts, router, probing
+
+    hosts, router, probing = asyncio.run(run())
+
+    assert hosts.requests == ['api.graph.org']
+    assert probing is True
+    assert router.stats['graph.org'].probing is False
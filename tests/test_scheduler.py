@@ -0,0 +1,140 @@
+""" Flood-wait handling of RequestScheduler against the local stand-in
+    server of the benchmarks
+
+    python -m pytest -q tests
+"""
+import asyncio
+import io
+import time
+
+from bcnadds.errors import RetryAfterError
+from bcnadds.metrics import Observer
+from bcnadds.scheduler import RequestScheduler
+from bcnadds.TgGraph import TgGraph
+
+from benchmarks.fake_server import FakeTelegraph
+
+
+class Recorder(Observer):
+    def __init__(self):
+        self.flood_waits = []
+        self.retries = 0
+
+    def on_flood_wait(self, metrics, retry_after):
+        self.flood_waits.append(retry_after)
+
+    def on_retry(self, metrics, error):
+        self.retries += 1
+
+
+async def create_pages(server_kwargs, scheduler, count=1):
+    """ (server, recorder, elapsed seconds, error) of `count` sequential
+        create_page calls
+    """
+    recorder = Recorder()
+
+    async with FakeTelegraph(**server_kwargs) as server:
+        session = server.session()
+        graph = TgGraph('token', session=session, scheduler=scheduler,
+                        observers=[recorder])
+        error = None
+        start = time.monotonic()
+
+        try:
+            for _ in range(count):
+                await graph.create_page('Title', html_content='<p>text</p>')
+        except RetryAfterError as e:
+            error = e
+        finally:
+            await session.aclose()
+
+        return server, recorder, time.monotonic() - start, error
+
+
+def test_flood_wait_is_waited_out_and_retried():
+    # the 2nd request asks to wait 1s, its retry is the 3rd
+    server, recorder, elapsed, error = asyncio.run(create_pages(
+        {'flood_every': 2, 'flood_wait': 1}, RequestScheduler(), count=2
+    ))
+
+    assert error is None
+    assert server.flood_waits == 1
+    assert server.requests == 3
+    assert recorder.flood_waits == [1]
+    assert recorder.retries == 1
+    assert elapsed >= 1.0
+
+
+def test_retries_give_up_after_max_retries():
+    server, recorder, _, error = asyncio.run(create_pages(
+        {'flood_every': 1, 'flood_wait': 0}, RequestScheduler(max_retries=2)
+    ))
+
+    assert isinstance(error, RetryAfterError)
+    assert error.retry_after == 0
+    assert server.requests == 3  # first attempt and 2 retries
+    assert recorder.retries == 2
+
+
+def test_long_flood_wait_is_raised_without_waiting():
+    server, recorder, elapsed, error = asyncio.run(create_pages(
+        {'flood_every': 1, 'flood_wait': 30},
+        RequestScheduler(max_retry_after=5)
+    ))
+
+    assert isinstance(error, RetryAfterError)
+    assert error.retry_after == 30
+    assert server.requests == 1
+    assert recorder.retries == 0
+    assert elapsed < 5
+
+
+
+def test_rate_limit_tokens_go_by_priority():
+    async def run():
+        scheduler = RequestScheduler(max_in_flight=8, token_rate=10,
+                                     token_burst=1)
+        order = []
+
+        def request(name):
+            async def call():
+                order.append(name)
+            return call
+
+        low = [asyncio.ensure_future(scheduler.submit(
+            request(f'low{i}'), token='token', priority=10
+        )) for i in range(6)]
+        await asyncio.sleep(0)  # the low priority requests queue first
+
+        high = scheduler.submit(request('HIGH'), token='token', priority=0)
+        await asyncio.gather(high, *low)
+        return order
+
+    order = asyncio.run(run())
+
+    # low0 takes the only token of the burst, HIGH gets the next one
+    assert order == ['low0', 'HIGH', 'low1', 'low2', 'low3', 'low4', 'low5']
+
+
+def test_upload_leaves_flood_waits_to_the_scheduler():
+    async def run():
+        async with FakeTelegraph(flood_every=1, flood_wait=2) as server:
+            session = server.session()
+            scheduler = RequestScheduler(max_retries=1, max_retry_after=1)
+            graph = TgGraph('token', session=session, scheduler=scheduler)
+            start = time.monotonic()
+
+            try:
+                results = await graph.upload_files(
+                    [(io.BytesIO(b'\x89PNG'), 'a.png')], retries=2
+                )
+            finally:
+                await session.aclose()
+
+            return server, results, time.monotonic() - start
+
+    server, results, elapsed = asyncio.run(run())
+
+    assert isinstance(results[0].error, RetryAfterError)
+    assert server.requests == 1
+    assert elapsed < 1
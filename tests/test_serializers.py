@@ -0,0 +1,37 @@
+""" Every JSON backend encodes like the stdlib reference
+
+    python -m pytest -q tests
+"""
+import pytest
+
+from bcnadds.serializers import SERIALIZERS, JsonSerializer
+from bcnadds.TgGraph import json_body
+
+VALUES = [
+    [float('nan'), float('inf'), -float('inf')],
+    {'a': [None, {'b': float('nan')}], 'c': 1.5},
+    [None, 'null', 0.1],
+    {'tag': 'p', 'children': ['ünïcode </script>', {'tag': 'br'}]},
+]
+
+
+def serializers():
+    for name, cls in SERIALIZERS.items():
+        try:
+            yield cls()
+        except ImportError:
+            continue
+
+
+@pytest.mark.parametrize('serializer', list(serializers()),
+                         ids=lambda serializer: serializer.name)
+@pytest.mark.parametrize('value', VALUES, ids=repr)
+def test_backend_matches_stdlib(serializer, value):
+    assert serializer.dumpb(value) == JsonSerializer().dumpb(value)
+
+
+def test_json_body_embeds_bytes_and_leaves_out_none():
+    body = json_body({'title': 'T', 'author_url': None, 'content': b'[1]'})
+
+    assert body == b'{"title":"T","content":[1]}'
+    assert json_body({}) == b'{}'